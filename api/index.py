@@ -1,17 +1,21 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Union
+import asyncio
 import os
 import sys
 import json
+import time
 
 # Add src directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from vector_search import VectorSearch
-from llm_client import LLMClient
-from response_formatter import ResponseFormatter
+# Heavy components (sentence-transformers, the corpus, the OpenAI client) load lazily in ServiceState
+from service import ServiceState
+import metrics
 
 app = FastAPI()
 
@@ -24,59 +28,339 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-class QuestionRequest(BaseModel):
+NO_CONTEXT_ANSWER = "I don't have enough information to answer this question based on the available course content and discussions."
+
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '256'))
+BATCH_LLM_CONCURRENCY = int(os.getenv('BATCH_LLM_CONCURRENCY', '8'))
+# Queries scored per matrix multiply; bounds the (queries x corpus) score matrix
+BATCH_SEARCH_CHUNK = 64
+
+class SearchFilters(BaseModel):
+    source: Optional[Union[str, List[str]]] = None
+    file: Optional[Union[str, List[str]]] = None
+    topic_id: Optional[Union[int, List[int]]] = None
+    tags: Optional[Union[str, List[str]]] = None
+    accepted_only: bool = False
+    created_after: Optional[str] = None
+    created_before: Optional[str] = None
+    min_likes: Optional[int] = None
+
+class BatchItem(BaseModel):
     question: str
     image: Optional[str] = None
+    filters: Optional[SearchFilters] = None
+
+class QuestionRequest(BatchItem):
+    stream: bool = False
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    stream: bool = False
 
 # Initialize components
-try:
-    data_file = os.path.join(os.path.dirname(__file__), '..', 'data', 'processed_data.json')
-    vector_search = VectorSearch(data_file)
-    llm_client = LLMClient()
-    formatter = ResponseFormatter()
-except Exception as e:
-    print(f"Initialization error: {e}")
-    vector_search = None
-    llm_client = None
-    formatter = None
+state = ServiceState()
+
+def answer_cache_metrics():
+    """Expose answer cache counters at scrape time"""
+    if state.answer_cache is None:
+        return
+    yield "# HELP rag_answer_cache_lookups_total Answer cache lookups by outcome"
+    yield "# TYPE rag_answer_cache_lookups_total counter"
+    for outcome, count in state.answer_cache.stats.items():
+        yield f'rag_answer_cache_lookups_total{{outcome="{outcome}"}} {count}'
+    yield "# HELP rag_answer_cache_hit_ratio Fraction of lookups served from the answer cache"
+    yield "# TYPE rag_answer_cache_hit_ratio gauge"
+    yield f"rag_answer_cache_hit_ratio {state.answer_cache.hit_rate()}"
+
+metrics.REGISTRY.add_collector(answer_cache_metrics)
+
+@app.middleware("http")
+async def record_timing(request: Request, call_next):
+    """Per-request latency histogram plus a Server-Timing header with stage durations"""
+    timer = metrics.start_request()
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    timer.add("total", elapsed)
+    # Label by route template, not the raw path, so unknown URLs cannot grow the label set
+    route = request.scope.get("route")
+    path = getattr(route, "path", None) or "unmatched"
+    metrics.REQUEST_SECONDS.observe(elapsed, path=path, status=response.status_code)
+    response.headers["Server-Timing"] = timer.server_timing()
+    return response
+
+@app.on_event("startup")
+async def start_initialization():
+    """Load components in the background so the process starts serving /ready immediately"""
+    if os.getenv('LAZY_INIT', '0') != '1':
+        state.start_background()
+
+async def require_ready():
+    """Wait for (or trigger) initialisation; fail with 503 if it did not succeed"""
+    if not state.ready:
+        await run_in_threadpool(state.initialize)
+    if not state.ready:
+        raise HTTPException(status_code=503, detail=f"Service not properly initialized: {state.error}")
+
+def search_filters(item: BatchItem) -> Optional[Dict]:
+    if item.filters is None:
+        return None
+    from metadata_index import parse_timestamp
+    filters = item.filters.dict(exclude_defaults=True)
+    for name in ('created_after', 'created_before'):
+        if name in filters:
+            try:
+                parse_timestamp(filters[name])
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"{name} must be an ISO date or datetime")
+    return filters
+
+def filters_key(item: BatchItem) -> str:
+    """Canonical JSON of the item's filters ('' when unfiltered), so equal filters share cached answers"""
+    filters = search_filters(item)
+    return json.dumps(filters, sort_keys=True) if filters else ''
+
+def retrieve(item: BatchItem, timer=None):
+    """Encode the question once and reuse the vector for search and the answer cache"""
+    query_embeddings, results, version = retrieve_batch([item], timer)
+    return query_embeddings[0], results[0], version
+
+def retrieve_batch(items: List[BatchItem], timer=None):
+    """Encode all questions in one call and score them against one pinned index snapshot"""
+    with state.index.acquire() as snapshot:
+        vector_search = snapshot.vector_search
+        with metrics.stage("encode", timer):
+            query_embeddings = vector_search.encode([item.question for item in items])
+        with metrics.stage("search", timer):
+            # Items sharing a filter are scored together, against only the rows it selects
+            groups: Dict[str, List[int]] = {}
+            for i, item in enumerate(items):
+                groups.setdefault(json.dumps(search_filters(item), sort_keys=True), []).append(i)
+            results = [None] * len(items)
+            for key, positions in groups.items():
+                filters = json.loads(key)
+                for start in range(0, len(positions), BATCH_SEARCH_CHUNK):
+                    chunk = positions[start:start + BATCH_SEARCH_CHUNK]
+                    hits = vector_search.search_embeddings(query_embeddings[chunk], 10, filters,
+                                                           queries=[items[i].question for i in chunk])
+                    for i, item_hits in zip(chunk, hits):
+                        results[i] = item_hits
+        return query_embeddings, results, snapshot.version
+
+def cached_answer(request: BatchItem, query_embedding, data_version: str) -> Optional[str]:
+    if state.answer_cache is None:
+        return None
+    with metrics.stage("cache_lookup"):
+        answer, _ = state.answer_cache.get(request.question, request.image, query_embedding, data_version,
+                                           filters=filters_key(request))
+    return answer
+
+def remember_answer(request: BatchItem, query_embedding, answer: str, data_version: str):
+    from llm_client import is_error_answer
+    if state.answer_cache is not None and not is_error_answer(answer):
+        state.answer_cache.put(request.question, answer, request.image, query_embedding,
+                               data_version=data_version, filters=filters_key(request))
+
+def wants_stream(request: QuestionRequest, http_request: Request) -> bool:
+    """Streaming is opt-in via the request body or an SSE Accept header"""
+    return request.stream or 'text/event-stream' in http_request.headers.get('accept', '')
+
+async def stream_answer(request: QuestionRequest, search_results, query_embedding, data_version: str):
+    """Send links first, then answer tokens, the stage timings, then the full {answer, links} payload"""
+    formatter = state.formatter
+    links = formatter.format_links(search_results)
+    yield formatter.format_event("links", {"links": links})
+
+    answer = NO_CONTEXT_ANSWER if not search_results else cached_answer(request, query_embedding, data_version)
+    if answer is not None:
+        yield formatter.format_event("token", {"text": answer})
+    else:
+        context = [result[0] for result in search_results]
+        parts = []
+        async for text in state.llm_client.stream_answer(request.question, context, request.image):
+            parts.append(text)
+            yield formatter.format_event("token", {"text": text})
+        answer = "".join(parts)
+        remember_answer(request, query_embedding, answer, data_version)
+
+    # Headers went out before the answer streamed, so the llm stage is only reported here
+    timer = metrics.current_timer()
+    if timer is not None:
+        yield formatter.format_event("timing", {"server_timing": timer.server_timing()})
+    yield formatter.format_event("done", {"answer": answer, "links": links})
 
 @app.post("/api/")
-async def answer_question(request: QuestionRequest):
+async def answer_question(request: QuestionRequest, http_request: Request, response: Response):
     """Main API endpoint for answering questions"""
+    await require_ready()
     try:
-        if not all([vector_search, llm_client, formatter]):
-            raise HTTPException(status_code=500, detail="Service not properly initialized")
-        
-        # Search for relevant context
-        search_results = vector_search.search(request.question, top_k=10)
-        
-        if not search_results:
-            return {
-                "answer": "I don't have enough information to answer this question based on the available course content and discussions.",
-                "links": []
-            }
-        
-        # Extract context for LLM
-        context = [result[0] for result in search_results]
-        
-        # Generate answer using LLM
-        answer = llm_client.generate_answer(
-            request.question, 
-            context, 
+        # Search for relevant context (CPU-bound, so keep it off the event loop)
+        query_embedding, search_results, data_version = await run_in_threadpool(
+            retrieve, request, metrics.current_timer()
+        )
+
+        if wants_stream(request, http_request):
+            return StreamingResponse(
+                stream_answer(request, search_results, query_embedding, data_version),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Index-Version": data_version}
+            )
+
+        response.headers["X-Index-Version"] = data_version
+        return await answer_from_results(request, query_embedding, search_results, data_version)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        metrics.record_error("answer_question", e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+async def answer_from_results(request: BatchItem, query_embedding, search_results, data_version: str) -> Dict:
+    """Answer one question from its search results in the ResponseFormatter schema"""
+    if not search_results:
+        return {
+            "answer": NO_CONTEXT_ANSWER,
+            "links": []
+        }
+
+    # Extract context for LLM
+    context = [result[0] for result in search_results]
+
+    # Generate answer using LLM, unless this (or a near-identical) question was answered already
+    answer = cached_answer(request, query_embedding, data_version)
+    if answer is None:
+        answer = await state.llm_client.generate_answer(
+            request.question,
+            context,
             request.image
         )
-        
-        # Format response
-        response = formatter.format_response(answer, search_results)
-        
-        return response
-        
+        remember_answer(request, query_embedding, answer, data_version)
+
+    # Format response
+    with metrics.stage("format"):
+        response = state.formatter.format_response(answer, search_results)
+
+    return response
+
+@app.post("/api/batch")
+async def answer_batch(request: BatchRequest, http_request: Request, response: Response):
+    """Answer many questions: one encode, batched search, bounded LLM fan-out, results in input order"""
+    await require_ready()
+    if not request.items:
+        return {"results": []}
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch has {len(request.items)} items; the limit is {BATCH_MAX_ITEMS}")
+
+    try:
+        query_embeddings, all_results, data_version = await run_in_threadpool(
+            retrieve_batch, request.items, metrics.current_timer()
+        )
+    except HTTPException:
+        raise
     except Exception as e:
+        metrics.record_error("answer_batch", e)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+    semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+
+    async def answer_item(index: int) -> Dict:
+        async with semaphore:
+            try:
+                return await answer_from_results(request.items[index], query_embeddings[index],
+                                                 all_results[index], data_version)
+            except Exception as e:
+                metrics.record_error("answer_batch", e)
+                return {"answer": f"Internal server error: {str(e)}", "links": []}
+
+    tasks = [asyncio.ensure_future(answer_item(i)) for i in range(len(request.items))]
+
+    if request.stream or 'application/x-ndjson' in http_request.headers.get('accept', ''):
+        async def ndjson():
+            # Lines are emitted in input order, each as soon as it and everything before it is done
+            try:
+                for index, task in enumerate(tasks):
+                    yield json.dumps({"index": index, **(await task)}, ensure_ascii=False) + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson",
+                                 headers={"X-Index-Version": data_version})
+
+    response.headers["X-Index-Version"] = data_version
+    return {"results": await asyncio.gather(*tasks)}
+
+@app.on_event("shutdown")
+async def close_clients():
+    if state.index is not None:
+        state.index.stop_watcher()
+    if state.llm_client is not None:
+        await state.llm_client.aclose()
+    if state.answer_cache is not None:
+        state.answer_cache.close()
+
 @app.get("/")
 async def health_check():
-    return {"status": "healthy"}
+    """Liveness plus the real initialisation state"""
+    status_code = 503 if state.status == 'failed' else 200
+    body = {"status": "healthy" if state.ready else state.status}
+    if state.error:
+        body["error"] = state.error
+    return JSONResponse(body, status_code=status_code)
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 200 only once every component is loaded"""
+    body = {"ready": state.ready, "status": state.status, "startup_profile": state.profile,
+            "index_version": state.index.version if state.index is not None else None}
+    if state.error:
+        body["error"] = state.error
+    return JSONResponse(body, status_code=200 if state.ready else 503)
+
+@app.post("/warmup")
+async def warmup():
+    """Initialise synchronously (retrying a failed start) and return the startup profile"""
+    await run_in_threadpool(state.initialize, True)
+    return await readiness()
+
+@app.post("/admin/reload")
+async def reload_index(http_request: Request, force: bool = False):
+    """Reload the processed data and swap it in without dropping requests; needs ADMIN_TOKEN"""
+    token = os.getenv('ADMIN_TOKEN')
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if http_request.headers.get('authorization') != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    await require_ready()
+    result = await run_in_threadpool(state.index.reload, force)
+    return JSONResponse(result, status_code=500 if 'error' in result else 200)
+
+def index_metrics():
+    """Expose the served index version and reload counters at scrape time"""
+    if state.index is None:
+        return
+    yield "# HELP rag_index_info Currently served index version"
+    yield "# TYPE rag_index_info gauge"
+    yield f'rag_index_info{{version="{state.index.version}"}} 1'
+    yield "# HELP rag_index_reloads_total Index reloads by outcome"
+    yield "# TYPE rag_index_reloads_total counter"
+    for outcome, count in state.index.stats.items():
+        yield f'rag_index_reloads_total{{outcome="{outcome}"}} {count}'
+
+metrics.REGISTRY.add_collector(index_metrics)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text exposition of stage latencies, token counts, cache and error counters"""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profile")
+async def sample_profile(seconds: float = 5.0):
+    """Sample all threads' stacks for a while (collapsed-stack output for flamegraphs); opt-in via PROFILER_ENABLED=1"""
+    if os.getenv('PROFILER_ENABLED', '0') != '1':
+        raise HTTPException(status_code=404, detail="Not Found")
+    interval = float(os.getenv('PROFILER_INTERVAL', '0.005'))
+    collapsed = await run_in_threadpool(metrics.profile_for, min(seconds, 60.0), interval)
+    return PlainTextResponse(collapsed)
 
 # For Vercel
-handler = app
\ No newline at end of file
+handler = app
@@ -0,0 +1,16 @@
+"""
+Offline performance benchmarks for ingestion, search and the API.
+
+    python -m benchmarks.run --sizes 1000 10000 --output results.json
+    python -m benchmarks.run --sizes 1000 --baseline results.json
+
+Everything runs on CPU without network access: corpora are synthetic, a
+hashing encoder stands in for sentence-transformers unless ``--encoder
+minilm`` is given, and the LLM is a local OpenAI-compatible stub server.
+"""
+
+import os
+import sys
+
+# Make the flat modules under src/ importable, as the root scripts do
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
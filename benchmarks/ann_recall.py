@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark recall@k and query latency of the IVF index against exact search
+on synthetic clustered corpora.
+
+    python benchmarks/ann_recall.py --sizes 10000 100000 1000000 --nprobe 8 16 32
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add src directory to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from ann_index import ExactIndex, IVFIndex
+from embedding_store import normalize_rows
+
+GENERATE_CHUNK_ROWS = 100000
+
+
+def synthetic_corpus(n_rows: int, dim: int, n_topics: int, noise: float, seed: int) -> np.ndarray:
+    """Normalised vectors scattered around random topic centres, like sentence embeddings"""
+    rng = np.random.default_rng(seed)
+    centres = normalize_rows(rng.standard_normal((n_topics, dim)))
+    corpus = np.empty((n_rows, dim), dtype=np.float32)
+    for start in range(0, n_rows, GENERATE_CHUNK_ROWS):
+        size = min(GENERATE_CHUNK_ROWS, n_rows - start)
+        labels = rng.integers(0, n_topics, size)
+        chunk = centres[labels] + noise * rng.standard_normal((size, dim), dtype=np.float32)
+        corpus[start:start + size] = normalize_rows(chunk)
+    return corpus
+
+
+def synthetic_queries(corpus: np.ndarray, n_queries: int, noise: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    rows = corpus[rng.choice(len(corpus), n_queries, replace=False)]
+    return normalize_rows(rows + noise * rng.standard_normal(rows.shape, dtype=np.float32))
+
+
+def timed_search(index, queries: np.ndarray, top_k: int, **kwargs):
+    """Run queries one at a time, as the API does, and collect per-query latency"""
+    ids, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result_ids, _ = index.search(query, top_k, **kwargs)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append(result_ids)
+    return ids, np.array(latencies)
+
+
+def recall_at_k(truth, found) -> float:
+    hits = sum(len(np.intersect1d(t, f)) for t, f in zip(truth, found))
+    return hits / max(1, sum(len(t) for t in truth))
+
+
+def latency_summary(latencies: np.ndarray) -> dict:
+    return {
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+    }
+
+
+def run(sizes, dim, top_k, n_queries, nprobes, n_topics, seed):
+    results = []
+    for size in sizes:
+        print(f"Generating {size} x {dim} corpus...")
+        corpus = synthetic_corpus(size, dim, n_topics, noise=0.08, seed=seed)
+        queries = synthetic_queries(corpus, n_queries, noise=0.05, seed=seed)
+
+        truth, exact_latencies = timed_search(ExactIndex(corpus), queries, top_k)
+        results.append({'size': size, 'mode': 'exact', 'recall': 1.0, **latency_summary(exact_latencies)})
+
+        start = time.perf_counter()
+        index = IVFIndex.build(corpus, seed=seed)
+        build_seconds = time.perf_counter() - start
+
+        for nprobe in nprobes:
+            found, latencies = timed_search(index, queries, top_k, nprobe=nprobe)
+            results.append({
+                'size': size,
+                'mode': 'ivf',
+                'n_lists': index.n_lists,
+                'nprobe': nprobe,
+                'build_s': round(build_seconds, 2),
+                'recall': round(recall_at_k(truth, found), 4),
+                **latency_summary(latencies),
+            })
+
+        for row in results[-(len(nprobes) + 1):]:
+            print(f"  {row['mode']:>5} nprobe={row.get('nprobe', '-'):>4} "
+                  f"recall@{top_k}={row['recall']:.4f} p50={row['p50_ms']:.3f}ms p99={row['p99_ms']:.3f}ms")
+        del corpus, index
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--dim', type=int, default=384, help='Embedding width (MiniLM-L6 is 384)')
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[4, 8, 16, 32, 64])
+    parser.add_argument('--topics', type=int, default=2000, help='Number of synthetic topic clusters')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.dim, args.top_k, args.queries, args.nprobe, args.topics, args.seed)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'benchmark': 'ann_recall', 'top_k': args.top_k, 'results': results}, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+from typing import Dict, List
+
+from service import ServiceState
+
+from .corpus import synthetic_questions
+from .stub_llm import StubLLMServer
+from .timing import latency_summary
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_api(store: str, encoder, port: int):
+    """Serve api/index.py with uvicorn in a background thread, components already loaded"""
+    import uvicorn
+    from api import index
+
+    index.state = ServiceState(store, model=encoder)
+    if not index.state.initialize():
+        raise RuntimeError(f"API failed to initialise: {index.state.error}")
+
+    server = uvicorn.Server(uvicorn.Config(index.app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, name='bench-api', daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn exited during startup")
+        time.sleep(0.01)
+    return server, thread
+
+
+async def _load(url: str, questions: List[str], concurrency: int, stream: bool) -> Dict:
+    import httpx
+
+    latencies, first_byte, errors = [], [], 0
+    queue = list(reversed(questions))
+
+    async def worker(client):
+        nonlocal errors
+        while queue:
+            question = queue.pop()
+            start = time.perf_counter()
+            try:
+                async with client.stream('POST', url, json={'question': question, 'stream': stream}) as response:
+                    first = None
+                    async for _ in response.aiter_bytes():
+                        if first is None:
+                            first = time.perf_counter() - start
+                    if response.status_code != 200:
+                        errors += 1
+                    elif stream and first is not None:
+                        first_byte.append(first)
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    result = {
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_sec': round(len(latencies) / max(elapsed, 1e-9), 1),
+        **latency_summary(latencies),
+    }
+    if stream:
+        result.update(latency_summary(first_byte, 'first_byte_'))
+    return result
+
+
+def run_api(store: str, encoder, n_requests: int = 200, concurrency: int = 16, llm_delay: float = 0.05,
+            token_delay: float = 0.0, stream: bool = False, seed: int = 0) -> Dict:
+    """Drive /api/ at a fixed concurrency against a local stub LLM; the answer cache is disabled"""
+    with StubLLMServer(delay=llm_delay, token_delay=token_delay) as stub:
+        previous = {key: os.environ.get(key) for key in ('OPENAI_BASE_URL', 'OPENAI_API_KEY', 'ANSWER_CACHE', 'LAZY_INIT')}
+        os.environ.update({'OPENAI_BASE_URL': stub.base_url, 'OPENAI_API_KEY': 'stub',
+                           'ANSWER_CACHE': '0', 'LAZY_INIT': '1'})
+        try:
+            port = _free_port()
+            server, thread = _start_api(store, encoder, port)
+            try:
+                questions = synthetic_questions(n_requests, seed)
+                result = asyncio.run(_load(f"http://127.0.0.1:{port}/api/", questions, concurrency, stream))
+            finally:
+                server.should_exit = True
+                thread.join()
+        finally:
+            for key, value in previous.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+    return {'concurrency': concurrency, 'llm_delay_s': llm_delay, 'stream': stream, **result}
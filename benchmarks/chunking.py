@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Compare chunk counts, chunk token lengths and encode time of the legacy
+heading splitter ("before") with the size-bounded chunker ("after").
+Lengths are counted with the model's tokenizer for ``--encoder minilm``,
+and with the chunker's own estimate otherwise.
+
+    python -m benchmarks.chunking --markdown-folder data/tds_pages_md \\
+        --discourse-file data/raw/discourse_posts.jsonl --encoder minilm
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from chunker import (Chunker, DEFAULT_MAX_TOKENS, DEFAULT_MIN_TOKENS, DEFAULT_OVERLAP_TOKENS, MODEL_MAX_TOKENS,
+                     count_tokens)
+from data_processor import iter_json_records, process_discourse_record, process_markdown_file
+
+from .encoders import ENCODERS, load_encoder
+
+# One chunk per post, like the pipeline before long posts were split
+UNBOUNDED = Chunker(max_tokens=10 ** 9, min_tokens=0, overlap_tokens=0)
+
+
+def legacy_markdown_sections(filepath: str) -> List[str]:
+    """The previous splitter: a new section at every line starting with '#', no size bound"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        lines = f.read().split('\n')
+    sections, current = [], ''
+    for line in lines:
+        if line.startswith('#'):
+            if current:
+                sections.append(current)
+            current = line + '\n'
+        else:
+            current += line + '\n'
+    if current:
+        sections.append(current)
+    return [section for section in sections if len(section) > 100]
+
+
+def token_counter(encoder) -> Callable[[List[str]], List[int]]:
+    """Count with the model's own tokenizer (special tokens included, as the model's limit is) when the
+    encoder has one; otherwise fall back to the chunker's estimate, which cannot show real truncation"""
+    tokenizer = getattr(encoder, 'tokenizer', None)
+    if tokenizer is None:
+        return lambda texts: [count_tokens(text) for text in texts]
+    return lambda texts: [len(ids) for ids in tokenizer(texts, add_special_tokens=True, truncation=False,
+                                                         verbose=False)['input_ids']] if texts else []
+
+
+def chunk_stats(texts: List[str], encoder, batch_size: int = 64) -> Dict:
+    tokenizer = getattr(encoder, 'tokenizer', None)
+    tokens = np.array(token_counter(encoder)(texts), dtype=np.int64)
+    start = time.perf_counter()
+    encoder.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    encode_seconds = time.perf_counter() - start
+    if tokens.size == 0:
+        tokens = np.zeros(1, dtype=np.int64)
+    return {
+        'token_counter': 'model tokenizer' if tokenizer is not None else 'estimate',
+        'chunks': len(texts),
+        'tokens_p50': int(np.percentile(tokens, 50)),
+        'tokens_p95': int(np.percentile(tokens, 95)),
+        'tokens_max': int(tokens.max()),
+        'total_tokens': int(tokens.sum()),
+        'over_model_limit': int((tokens > MODEL_MAX_TOKENS).sum()),
+        # Text past the model's window costs encode time but is never embedded
+        'truncated_tokens': int(np.maximum(tokens - MODEL_MAX_TOKENS, 0).sum()),
+        'encode_seconds': round(encode_seconds, 4),
+        'encode_chunks_per_sec': round(len(texts) / max(encode_seconds, 1e-9), 1),
+    }
+
+
+def run_chunking(markdown_folder: str, discourse_file: Optional[str], encoder,
+                 chunker: Optional[Chunker] = None) -> Dict:
+    """Chunk the same markdown pages and posts both ways and report stats for each"""
+    chunker = chunker or Chunker()
+    filepaths = [os.path.join(markdown_folder, name) for name in sorted(os.listdir(markdown_folder))
+                 if name.endswith('.md')]
+    records = list(iter_json_records(discourse_file)) if discourse_file and os.path.exists(discourse_file) else []
+
+    before = [text for path in filepaths for text in legacy_markdown_sections(path)]
+    before += [chunk['content'] for record in records for chunk in process_discourse_record(record, UNBOUNDED)]
+
+    start = time.perf_counter()
+    after = [chunk['content'] for path in filepaths for chunk in process_markdown_file(path, chunker)]
+    after += [chunk['content'] for record in records for chunk in process_discourse_record(record, chunker)]
+    chunking_seconds = time.perf_counter() - start
+
+    return {
+        'max_tokens': chunker.max_tokens,
+        'overlap_tokens': chunker.overlap_tokens,
+        'before': chunk_stats(before, encoder),
+        'after': {**chunk_stats(after, encoder), 'chunking_seconds': round(chunking_seconds, 4)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--markdown-folder', default='data/tds_pages_md')
+    parser.add_argument('--discourse-file', default='data/raw/discourse_posts.jsonl')
+    parser.add_argument('--encoder', choices=ENCODERS, default='hashing')
+    parser.add_argument('--max-tokens', type=int, default=DEFAULT_MAX_TOKENS)
+    parser.add_argument('--min-tokens', type=int, default=DEFAULT_MIN_TOKENS)
+    parser.add_argument('--overlap-tokens', type=int, default=DEFAULT_OVERLAP_TOKENS)
+    args = parser.parse_args()
+
+    chunker = Chunker(max_tokens=args.max_tokens, min_tokens=args.min_tokens, overlap_tokens=args.overlap_tokens)
+    print(json.dumps(run_chunking(args.markdown_folder, args.discourse_file, load_encoder(args.encoder), chunker),
+                     indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Measure API cold start in fresh interpreter processes: time to import
+api/index.py, then the per-phase initialisation profile (imports, model
+load, index load, warm-up).
+
+    python benchmarks/cold_start.py --runs 3 --output cold_start.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, %(root)r)
+from api import index
+import_seconds = time.perf_counter() - start
+ready = index.state.initialize()
+print(json.dumps({
+    'ready': ready,
+    'error': index.state.error,
+    'module_import': round(import_seconds, 4),
+    'phases': index.state.profile,
+    'total': round(time.perf_counter() - start, 4),
+}))
+"""
+
+
+def measure_once(env) -> dict:
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE % {'root': os.path.abspath(ROOT)}],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    env = dict(os.environ, LAZY_INIT='1')
+    runs = [measure_once(env) for _ in range(args.runs)]
+    for i, run in enumerate(runs, 1):
+        print(f"run {i}: total={run['total']:.3f}s import={run['module_import']:.3f}s phases={run['phases']}")
+        if not run['ready']:
+            print(f"  initialisation failed: {run['error']}")
+
+    summary = {
+        'benchmark': 'cold_start',
+        'runs': runs,
+        'median_total_s': statistics.median(run['total'] for run in runs),
+    }
+    print(f"median cold start: {summary['median_total_s']:.3f}s")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+from typing import Dict, List, Tuple
+
+
+def flatten(results: Dict, prefix: str = '') -> Dict[str, float]:
+    """``{'search': {'n=1000': {'p50_ms': 1.2}}}`` -> ``{'search.n=1000.p50_ms': 1.2}`` (numbers only)"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def direction(metric: str) -> int:
+    """+1 if higher is better, -1 if lower is better, 0 if informational"""
+    if metric.endswith('_per_sec'):
+        return 1
+    if metric.endswith(('_ms', '_seconds', 'errors')):
+        return -1
+    return 0
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float = 0.1) -> Tuple[List[Dict], List[Dict]]:
+    """Return (regressions, all comparisons) for metrics present in both result sets"""
+    current_flat = flatten(current['results'])
+    baseline_flat = flatten(baseline['results'])
+    rows, regressions = [], []
+    for metric in sorted(current_flat.keys() & baseline_flat.keys()):
+        sign = direction(metric.rsplit('.', 1)[-1])
+        old, new = baseline_flat[metric], current_flat[metric]
+        if sign == 0:
+            continue
+        change = (new - old) / old if old else (0.0 if new == old else float('inf'))
+        row = {'metric': metric, 'baseline': old, 'current': new, 'change': round(change, 4)}
+        rows.append(row)
+        if sign * change < -tolerance:
+            regressions.append(row)
+    return regressions, rows
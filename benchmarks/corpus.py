@@ -0,0 +1,86 @@
+import json
+import os
+import random
+from typing import List
+
+# Small topical vocabularies so synthetic questions retrieve related chunks
+TOPICS = {
+    'pandas': 'dataframe groupby merge pivot index column series csv parquet dtype aggregate',
+    'docker': 'container image dockerfile volume compose registry port build layer podman',
+    'git': 'commit branch merge rebase remote push pull stash diff checkout',
+    'regression': 'linear model coefficient residual feature fit predict scikit error variance',
+    'scraping': 'html requests beautifulsoup selector playwright crawl parse api json pagination',
+    'llm': 'prompt token embedding openai completion context model temperature chat vector',
+    'visualisation': 'chart plot matplotlib seaborn axis histogram scatter colour legend figure',
+    'deployment': 'vercel server fastapi uvicorn endpoint environment secret url request response',
+}
+FILLER = ('the a to of and in is for on with this that how why when can should does my we you it '
+          'error question assignment project week grade deadline submission help please thanks').split()
+
+
+def _sentence(rng: random.Random, topic_words: List[str], length: int) -> str:
+    words = [rng.choice(topic_words) if rng.random() < 0.4 else rng.choice(FILLER) for _ in range(length)]
+    return ' '.join(words).capitalize() + '.'
+
+
+def _paragraph(rng: random.Random, topic: str, sentences: int) -> str:
+    topic_words = TOPICS[topic].split()
+    return ' '.join(_sentence(rng, topic_words, rng.randint(8, 20)) for _ in range(sentences))
+
+
+def write_discourse_jsonl(path: str, n_posts: int, seed: int = 0, posts_per_topic: int = 8):
+    """Flat per-post records in the scraper's JSONL schema"""
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(n_posts):
+            topic_id = 100000 + i // posts_per_topic
+            post_number = i % posts_per_topic + 1
+            topic = topics[topic_id % len(topics)]
+            record = {
+                'topic_id': topic_id,
+                'topic_title': f"Question about {topic} #{topic_id}",
+                'topic_slug': f"question-about-{topic}-{topic_id}",
+                'post_number': post_number,
+                'url': f"https://discourse.example/t/question-about-{topic}-{topic_id}/{topic_id}/{post_number}",
+                'created_at': f"2025-{1 + i % 4:02d}-{1 + i % 28:02d}T10:00:00Z",
+                'tags': [topic, 'week-' + str(1 + topic_id % 12)],
+                'like_count': rng.randint(0, 5),
+                'is_accepted_answer': post_number == 2 and rng.random() < 0.5,
+                'content': '<p>' + _paragraph(rng, topic, rng.randint(2, 6)) + '</p>',
+            }
+            f.write(json.dumps(record) + '\n')
+
+
+def write_course_markdown(folder: str, n_pages: int, seed: int = 0, sections_per_page: int = 6):
+    rng = random.Random(seed + 1)
+    topics = list(TOPICS)
+    os.makedirs(folder, exist_ok=True)
+    for page in range(n_pages):
+        topic = topics[page % len(topics)]
+        lines = [f"# {topic.title()} notes {page}", '', _paragraph(rng, topic, 3), '']
+        for section in range(sections_per_page):
+            lines += [f"## {topic.title()} part {section}", '', _paragraph(rng, topic, rng.randint(3, 8)), '']
+        with open(os.path.join(folder, f"{topic}_{page}.md"), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+
+
+def synthetic_questions(n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed + 2)
+    topics = list(TOPICS)
+    questions = []
+    for _ in range(n):
+        topic_words = TOPICS[rng.choice(topics)].split()
+        questions.append(f"How do I use {rng.choice(topic_words)} with {rng.choice(topic_words)} "
+                         f"in the {rng.choice(topic_words)} assignment?")
+    return questions
+
+
+def generate_corpus(folder: str, n_posts: int, seed: int = 0) -> dict:
+    """Write a Discourse JSONL file plus roughly one markdown page per 50 posts"""
+    os.makedirs(folder, exist_ok=True)
+    discourse_file = os.path.join(folder, 'discourse_posts.jsonl')
+    markdown_folder = os.path.join(folder, 'tds_pages_md')
+    write_discourse_jsonl(discourse_file, n_posts, seed)
+    write_course_markdown(markdown_folder, max(1, n_posts // 50), seed)
+    return {'discourse_file': discourse_file, 'markdown_folder': markdown_folder}
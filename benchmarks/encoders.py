@@ -0,0 +1,57 @@
+import hashlib
+import re
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r'\w+')
+DEFAULT_DIM = 384
+ENCODERS = ('hashing', 'minilm')
+
+
+class HashingEncoder:
+    """Deterministic bag-of-words feature-hashing encoder with the SentenceTransformer interface.
+
+    Texts sharing words get similar vectors, so search results are
+    meaningful, but encoding costs microseconds: benchmarks measure the
+    pipeline around the model rather than the model itself.
+    """
+
+    def __init__(self, dim: int = DEFAULT_DIM):
+        self.dim = dim
+        self.name = f'hashing-{dim}'
+        self._bucket_cache = {}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _bucket(self, token: str):
+        bucket = self._bucket_cache.get(token)
+        if bucket is None:
+            digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+            value = int.from_bytes(digest, 'little')
+            bucket = self._bucket_cache[token] = (value % self.dim, 1.0 if value >> 63 else -1.0)
+        return bucket
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        embeddings = np.zeros((len(sentences), self.dim), dtype=np.float32)
+        for row, text in enumerate(sentences):
+            for token in TOKEN_PATTERN.findall(text.lower()):
+                column, sign = self._bucket(token)
+                embeddings[row, column] += sign
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.where(norms == 0, 1.0, norms)
+        return embeddings
+
+
+def load_encoder(name: str):
+    """``hashing`` (offline, near-free) or ``minilm`` (the production model; must already be cached locally)"""
+    if name == 'hashing':
+        return HashingEncoder()
+    if name == 'minilm':
+        from sentence_transformers import SentenceTransformer
+        from data_processor import MODEL_NAME
+        return SentenceTransformer(MODEL_NAME)
+    raise ValueError(f"Unknown encoder {name!r}, expected 'hashing' or 'minilm'")
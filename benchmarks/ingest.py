@@ -0,0 +1,45 @@
+import os
+import time
+from typing import Dict
+
+from data_processor import DataProcessor, peak_memory_mb
+
+from .corpus import generate_corpus
+
+
+def run_ingest(workdir: str, n_posts: int, encoder, workers: int = None, batch_size: int = 64,
+               seed: int = 0) -> Dict:
+    """Time chunking, encoding and saving a synthetic corpus; returns metrics and the store path"""
+    corpus = generate_corpus(os.path.join(workdir, 'raw'), n_posts, seed)
+    output = os.path.join(workdir, 'processed_data')
+
+    processor = DataProcessor(batch_size=batch_size, workers=workers, model=encoder)
+    start = time.perf_counter()
+    data = processor.process_discourse_data(corpus['discourse_file'])
+    data += processor.process_course_content(corpus['markdown_folder'])
+    processor.create_embeddings(data)
+
+    save_start = time.perf_counter()
+    processor.save_processed_data(output)
+    save_seconds = time.perf_counter() - save_start
+    total_seconds = time.perf_counter() - start
+
+    stats = processor.stats
+    peak = peak_memory_mb()
+    return {
+        'store': output,
+        'metrics': {
+            'posts': n_posts,
+            'chunks': len(data),
+            'workers': processor.workers,
+            'chunking_seconds': round(stats['chunking_seconds'], 4),
+            'chunking_chunks_per_sec': round(stats['chunks'] / max(stats['chunking_seconds'], 1e-9), 1),
+            'encode_seconds': round(stats['encode_seconds'], 4),
+            'encode_chunks_per_sec': round(stats['encoded_chunks'] / max(stats['encode_seconds'], 1e-9), 1),
+            'save_seconds': round(save_seconds, 4),
+            'lexical_index_seconds': round(stats['lexical_seconds'], 4),
+            'total_seconds': round(total_seconds, 4),
+            'peak_memory_mb': round(peak['self'], 1),
+            'peak_child_memory_mb': round(peak['children'], 1),
+        }
+    }
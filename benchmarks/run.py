@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Run the ingestion, chunking, search and API benchmarks on synthetic corpora and
+optionally compare against a saved baseline.
+
+    python -m benchmarks.run --sizes 1000 10000 --output results.json
+    python -m benchmarks.run --sizes 1000 --baseline results.json --tolerance 0.15
+
+Exits non-zero when a metric regresses by more than the tolerance.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from .compare import compare
+from .encoders import ENCODERS, load_encoder
+from .chunking import run_chunking
+from .ingest import run_ingest
+from .search import run_search
+
+SUITES = ('ingest', 'chunking', 'search', 'api')
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000],
+                        help='Synthetic corpus sizes in Discourse posts')
+    parser.add_argument('--suites', nargs='+', choices=SUITES, default=list(SUITES))
+    parser.add_argument('--encoder', choices=ENCODERS, default='hashing',
+                        help='hashing: offline stand-in; minilm: the production model (must be cached locally)')
+    parser.add_argument('--workers', type=int, default=None, help='Chunking processes (default: all cores)')
+    parser.add_argument('--queries', type=int, default=200, help='Queries per search benchmark')
+    parser.add_argument('--index-mode', choices=['exact', 'approximate'], default='exact')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per API benchmark')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent API clients')
+    parser.add_argument('--llm-delay', type=float, default=0.05, help='Stub LLM response delay in seconds')
+    parser.add_argument('--stream', action='store_true', help='Benchmark the SSE streaming response path')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--baseline', help='Compare against a previous results JSON')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Allowed relative regression before failing (0.1 = 10%%)')
+    args = parser.parse_args()
+
+    encoder = load_encoder(args.encoder)
+    results = {suite: {} for suite in args.suites}
+
+    for size in args.sizes:
+        label = f"n={size}"
+        with tempfile.TemporaryDirectory(prefix='tds-bench-') as workdir:
+            # Search and API benchmarks need a store, so ingestion always runs
+            ingest = run_ingest(workdir, size, encoder, workers=args.workers, seed=args.seed)
+            if 'ingest' in results:
+                results['ingest'][label] = ingest['metrics']
+                print(f"[ingest {label}] {ingest['metrics']}")
+
+            if 'chunking' in results:
+                raw = os.path.join(workdir, 'raw')
+                results['chunking'][label] = run_chunking(os.path.join(raw, 'tds_pages_md'),
+                                                          os.path.join(raw, 'discourse_posts.jsonl'), encoder)
+                print(f"[chunking {label}] {results['chunking'][label]}")
+
+            if 'search' in results:
+                results['search'][label] = run_search(ingest['store'], encoder, n_queries=args.queries,
+                                                      index_mode=args.index_mode, seed=args.seed)
+                print(f"[search {label}] {results['search'][label]}")
+
+            if 'api' in results:
+                from .api_load import run_api
+                results['api'][label] = run_api(ingest['store'], encoder, n_requests=args.requests,
+                                                concurrency=args.concurrency, llm_delay=args.llm_delay,
+                                                stream=args.stream, seed=args.seed)
+                print(f"[api {label}] {results['api'][label]}")
+
+    report = {'environment': environment(), 'encoder': args.encoder, 'results': results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions, rows = compare(report, baseline, args.tolerance)
+        for row in rows:
+            marker = 'REGRESSION' if row in regressions else ''
+            print(f"{row['metric']:<55} {row['baseline']:>12} -> {row['current']:>12} ({row['change']:+.1%}) {marker}")
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        print("No regressions beyond tolerance")
+
+
+if __name__ == "__main__":
+    main()
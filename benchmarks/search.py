@@ -0,0 +1,57 @@
+import time
+from typing import Dict
+
+from vector_search import VectorSearch
+
+from .corpus import synthetic_questions
+from .timing import latency_summary
+
+# A narrow filter (recent forum posts) typical of "what was said lately about X" queries
+FILTER = {'source': 'discourse', 'created_after': '2025-04-01'}
+
+
+def run_search(store: str, encoder, n_queries: int = 200, top_k: int = 10, batch_size: int = 32,
+               index_mode: str = 'exact', seed: int = 0) -> Dict:
+    """Time store load, per-query encode/search latency (dense, filtered, BM25 and hybrid) and batch throughput"""
+    start = time.perf_counter()
+    search = VectorSearch(store, index_mode=index_mode, model=encoder)
+    load_seconds = time.perf_counter() - start
+    hybrid = VectorSearch(store, index_mode=index_mode, model=encoder, retrieval='hybrid')
+
+    questions = synthetic_questions(n_queries, seed)
+    encode_times, search_times, filtered_times, lexical_times, hybrid_times = [], [], [], [], []
+    for question in questions:
+        start = time.perf_counter()
+        embeddings = search.encode([question])
+        encode_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        search.search_embeddings(embeddings, top_k)
+        search_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        search.search_embeddings(embeddings, top_k, filters=FILTER)
+        filtered_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        hybrid.lexical.search([question], top_k)
+        lexical_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        hybrid.search_embeddings(embeddings, top_k, queries=[question])
+        hybrid_times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, len(questions), batch_size):
+        search.search_batch(questions[i:i + batch_size], top_k)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        'index_mode': index_mode,
+        'rows': int(search.embeddings.shape[0]),
+        'load_seconds': round(load_seconds, 4),
+        **latency_summary(encode_times, 'encode_'),
+        **latency_summary(search_times, 'search_'),
+        'filtered_rows': int(len(search.filter_rows(FILTER))),
+        **latency_summary(filtered_times, 'filtered_search_'),
+        'lexical_terms': hybrid.lexical.n_terms,
+        **latency_summary(lexical_times, 'lexical_search_'),
+        **latency_summary(hybrid_times, 'hybrid_search_'),
+        'batch_queries_per_sec': round(len(questions) / max(batch_seconds, 1e-9), 1),
+    }
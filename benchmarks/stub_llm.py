@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible chat completions stub, so API benchmarks need no
+network or API key.
+
+    python -m benchmarks.stub_llm --port 8100 --delay 0.2 --token-delay 0.005
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=stub uvicorn api.index:app
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+STUB_ANSWER = ("Based on the course material, use the approach described in the linked "
+               "discussion and check the relevant week's notes for the exact steps.")
+
+
+class StubLLMServer:
+    """Serves ``POST /v1/chat/completions`` (plain JSON or SSE when ``stream`` is set).
+
+    ``delay`` is added before the first byte of every response, and
+    ``token_delay`` between streamed tokens, to mimic model latency. The
+    next ``failures`` requests get ``failure_status`` (with ``retry_after``
+    as a Retry-After header if set), and ``max_in_flight`` records the
+    highest number of requests handled at once.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, delay: float = 0.0,
+                 token_delay: float = 0.0, answer: str = STUB_ANSWER, failures: int = 0,
+                 failure_status: int = 503, retry_after: Optional[float] = None):
+        self.delay = delay
+        self.token_delay = token_delay
+        self.answer = answer
+        self.failures = failures
+        self.failure_status = failure_status
+        self.retry_after = retry_after
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> 'StubLLMServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stub-llm', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self._send_json(404, {'error': {'message': f'unknown path {self.path}'}})
+                    return
+                with stub._lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    fail = stub.failures > 0
+                    if fail:
+                        stub.failures -= 1
+                try:
+                    if stub.delay:
+                        time.sleep(stub.delay)
+                    if fail:
+                        headers = {'Retry-After': str(stub.retry_after)} if stub.retry_after is not None else {}
+                        self._send_json(stub.failure_status, {'error': {'message': 'stub failure'}}, headers)
+                    elif body.get('stream'):
+                        self._stream(body)
+                    else:
+                        self._send_json(200, stub.completion(body))
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, body: dict):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for chunk in stub.stream_chunks(body):
+                    if stub.token_delay:
+                        time.sleep(stub.token_delay)
+                    self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def _usage(self, body: dict) -> dict:
+        prompt_tokens = sum(len(str(message.get('content', '')).split()) for message in body.get('messages', []))
+        completion_tokens = len(self.answer.split())
+        return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens}
+
+    def completion(self, body: dict) -> dict:
+        return {
+            'id': f'chatcmpl-stub-{self.requests}', 'object': 'chat.completion', 'created': int(time.time()),
+            'model': body.get('model', 'stub'),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': self.answer}}],
+            'usage': self._usage(body),
+        }
+
+    def stream_chunks(self, body: dict):
+        base = {'id': f'chatcmpl-stub-{self.requests}', 'object': 'chat.completion.chunk',
+                'created': int(time.time()), 'model': body.get('model', 'stub')}
+        words = self.answer.split(' ')
+        for i, word in enumerate(words):
+            text = word if i == 0 else ' ' + word
+            yield {**base, 'choices': [{'index': 0, 'delta': {'content': text}, 'finish_reason': None}]}
+        yield {**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}
+        if (body.get('stream_options') or {}).get('include_usage'):
+            yield {**base, 'choices': [], 'usage': self._usage(body)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--delay', type=float, default=0.2, help='Seconds before each response starts')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='Seconds between streamed tokens')
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, args.delay, args.token_delay)
+    print(f"Stub LLM listening on {server.base_url} (delay {args.delay}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
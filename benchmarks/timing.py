@@ -0,0 +1,16 @@
+from typing import Dict, Sequence
+
+import numpy as np
+
+
+def latency_summary(seconds: Sequence[float], prefix: str = '') -> Dict[str, float]:
+    """p50/p95/p99/mean in milliseconds for a list of durations in seconds"""
+    values = np.asarray(seconds, dtype=np.float64) * 1000
+    if values.size == 0:
+        return {}
+    return {
+        f'{prefix}p50_ms': round(float(np.percentile(values, 50)), 3),
+        f'{prefix}p95_ms': round(float(np.percentile(values, 95)), 3),
+        f'{prefix}p99_ms': round(float(np.percentile(values, 99)), 3),
+        f'{prefix}mean_ms': round(float(values.mean()), 3),
+    }
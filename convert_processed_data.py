@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Convert a legacy processed_data.json into the binary embedding store format
+"""
+
+import argparse
+import os
+import sys
+
+# Add src directory to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from embedding_store import convert_json_to_store, store_prefix
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('input', nargs='?', default='data/processed_data.json',
+                        help='Legacy processed_data.json file')
+    parser.add_argument('--output', help='Output prefix (defaults to the input path without .json)')
+    parser.add_argument('--dtype', choices=['float32', 'float16'], default='float32')
+    args = parser.parse_args()
+
+    prefix = args.output or store_prefix(args.input)
+    header = convert_json_to_store(args.input, prefix, dtype=args.dtype, model_name='all-MiniLM-L6-v2')
+    print(f"Wrote {prefix}.npy and {prefix}.meta.json "
+          f"({header['shape'][0]} x {header['shape'][1]} {header['dtype']}, version {header['data_version']})")
+
+if __name__ == "__main__":
+    main()
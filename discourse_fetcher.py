@@ -0,0 +1,152 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class FetchError(Exception):
+    """Raised when a URL could not be fetched as JSON after all retries"""
+
+    def __init__(self, url: str, message: str, status_code: Optional[int] = None):
+        super().__init__(f"{url}: {message}")
+        self.url = url
+        self.status_code = status_code
+
+
+class RateLimiter:
+    """Async token bucket: at most ``rate`` requests per second with bursts up to ``burst``"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def slow_down(self, seconds: float):
+        """Drain the bucket so every caller waits after the server pushes back"""
+        self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+def load_storage_state_cookies(auth_state_file: str) -> httpx.Cookies:
+    """Turn a Playwright storage-state file into cookies for an HTTP client"""
+    with open(auth_state_file, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+
+    cookies = httpx.Cookies()
+    for cookie in state.get('cookies', []):
+        cookies.set(cookie['name'], cookie['value'],
+                    domain=cookie.get('domain', '').lstrip('.'), path=cookie.get('path', '/'))
+    return cookies
+
+
+class DiscourseFetcher:
+    """Pooled, concurrent JSON fetcher for Discourse endpoints.
+
+    One ``httpx.AsyncClient`` carries the saved session cookies and keeps
+    connections alive, a semaphore bounds in-flight requests, each host gets
+    its own token-bucket rate limit, and 429/5xx/transport errors are retried
+    with exponential backoff that honours ``Retry-After``.
+    """
+
+    def __init__(self, cookies: Optional[httpx.Cookies] = None, max_concurrency: int = 8,
+                 requests_per_second: float = 4.0, max_retries: int = 5, timeout: float = 30.0,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0, transport=None):
+        self.max_retries = max_retries
+        self.requests_per_second = requests_per_second
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._client = httpx.AsyncClient(
+            cookies=cookies,
+            headers={'Accept': 'application/json', 'User-Agent': 'tds-virtual-ta-scraper'},
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            timeout=timeout,
+            follow_redirects=True,
+            transport=transport
+        )
+
+    @classmethod
+    def from_storage_state(cls, auth_state_file: str, **kwargs) -> 'DiscourseFetcher':
+        return cls(cookies=load_storage_state_cookies(auth_state_file), **kwargs)
+
+    async def __aenter__(self) -> 'DiscourseFetcher':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def _limiter(self, url: str) -> RateLimiter:
+        host = urlparse(url).netloc
+        if host not in self._limiters:
+            burst = max(1, int(self.requests_per_second))
+            self._limiters[host] = RateLimiter(self.requests_per_second, burst)
+        return self._limiters[host]
+
+    async def fetch_json(self, url: str) -> Dict:
+        """GET a URL and decode its JSON body, retrying transient failures"""
+        limiter = self._limiter(url)
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire()
+            try:
+                async with self._semaphore:
+                    response = await self._client.get(url)
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise FetchError(url, f"transport error: {e}")
+                await asyncio.sleep(self._backoff_delay(attempt))
+                continue
+
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                if attempt >= self.max_retries:
+                    raise FetchError(url, f"HTTP {response.status_code} after {attempt + 1} attempts",
+                                     response.status_code)
+                delay = self._backoff_delay(attempt, response.headers.get('retry-after'))
+                if response.status_code == 429:
+                    logger.warning(f"⏳ Rate limited on {url}, backing off {delay:.1f}s")
+                    limiter.slow_down(delay)
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code != 200:
+                raise FetchError(url, f"HTTP {response.status_code}", response.status_code)
+            try:
+                return response.json()
+            except ValueError:
+                # Usually a login or challenge page instead of JSON: the session is not accepted
+                raise FetchError(url, "response was not JSON", response.status_code)
+
+        raise FetchError(url, "retries exhausted")
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
@@ -1,27 +1,42 @@
 import os
 import json
+import argparse
+import asyncio
 from datetime import datetime
 from playwright.sync_api import sync_playwright, TimeoutError
 from bs4 import BeautifulSoup
 import logging
 from pathlib import Path
+from urllib.parse import urlencode
+from discourse_fetcher import DiscourseFetcher, FetchError
+from scrape_checkpoint import ScrapeCheckpoint
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# A topic document embeds only the first ~20 posts; the rest are fetched by id in batches of this size
+POSTS_PER_REQUEST = 20
+
 class TDSDiscourseScraper:
     def __init__(self, base_url="https://discourse.onlinedegree.iitm.ac.in", 
-                 category_id=34, date_from=None, date_to=None):
+                 category_id=34, date_from=None, date_to=None,
+                 max_concurrency=8, requests_per_second=4.0, incremental=True):
         self.BASE_URL = base_url
         self.CATEGORY_ID = category_id
         self.CATEGORY_JSON_URL = f"{base_url}/c/courses/tds-kb/{category_id}.json"
         self.AUTH_STATE_FILE = "data/raw/auth.json"
-        self.OUTPUT_FILE = "data/raw/discourse_posts.json"
+        self.OUTPUT_FILE = "data/raw/discourse_posts.jsonl"
+        self.CHECKPOINT_FILE = "data/raw/scrape_checkpoint.jsonl"
+        self.INCREMENTAL = incremental
         
         # Set default date range if not provided
         self.DATE_FROM = date_from or datetime(2025, 1, 1)
         self.DATE_TO = date_to or datetime(2025, 4, 14)
+
+        # HTTP fetch engine settings (browser navigation is only a fallback)
+        self.MAX_CONCURRENCY = max_concurrency
+        self.REQUESTS_PER_SECOND = requests_per_second
         
         # Ensure data directories exist
         Path("data/raw").mkdir(parents=True, exist_ok=True)
@@ -63,7 +78,7 @@ class TDSDiscourseScraper:
         except (TimeoutError, json.JSONDecodeError):
             return False
 
-    def scrape_posts(self, playwright):
+    def scrape_posts(self, playwright, checkpoint):
         """Main scraping function"""
         logger.info("🔍 Starting scrape using saved session...")
         browser = playwright.chromium.launch(headless=True)
@@ -71,12 +86,9 @@ class TDSDiscourseScraper:
         page = context.new_page()
 
         try:
-            all_topics = self._fetch_all_topics(page)
-            filtered_posts = self._process_topics(page, all_topics)
-            self._save_posts(filtered_posts)
-            
-            logger.info(f"✅ Scraped {len(filtered_posts)} posts between {self.DATE_FROM.date()} and {self.DATE_TO.date()}")
-            return filtered_posts
+            all_topics = self._with_retries(self._fetch_all_topics(page), checkpoint)
+            post_count = self._process_topics(page, all_topics, checkpoint)
+            return post_count
         
         except Exception as e:
             logger.error(f"Scraping failed: {e}")
@@ -84,6 +96,91 @@ class TDSDiscourseScraper:
         finally:
             browser.close()
 
+    def scrape_topics_with_browser(self, playwright, topics, checkpoint):
+        """Fallback: fetch specific topics through browser navigation, appending to the output file"""
+        logger.info(f"🌐 Fetching {len(topics)} topics through the browser...")
+        browser = playwright.chromium.launch(headless=True)
+        context = browser.new_context(storage_state=self.AUTH_STATE_FILE)
+        page = context.new_page()
+        try:
+            return self._process_topics(page, topics, checkpoint)
+        finally:
+            browser.close()
+
+    async def scrape_posts_async(self, checkpoint):
+        """Fetch category pages and changed topics concurrently over pooled HTTP.
+
+        Returns the number of posts written and the topics that could not be
+        fetched, which the caller retries through the browser.
+        """
+        logger.info(f"🔍 Starting HTTP scrape ({self.MAX_CONCURRENCY} workers, {self.REQUESTS_PER_SECOND} req/s)...")
+        async with DiscourseFetcher.from_storage_state(
+            self.AUTH_STATE_FILE,
+            max_concurrency=self.MAX_CONCURRENCY,
+            requests_per_second=self.REQUESTS_PER_SECOND
+        ) as fetcher:
+            all_topics = self._with_retries(await self._fetch_all_topics_async(fetcher, checkpoint), checkpoint)
+            topics = [topic for topic in all_topics
+                      if self._in_date_range(topic) and checkpoint.is_changed(topic)]
+            logger.info(f"🔁 {len(topics)} of {len(all_topics)} listed topics are new or changed")
+
+            async def fetch_topic(topic):
+                try:
+                    topic_data = await fetcher.fetch_json(self._topic_json_url(topic))
+                    pages = await asyncio.gather(*[
+                        fetcher.fetch_json(url)
+                        for url in self._missing_posts_urls(topic, topic_data, checkpoint.last_post_id(topic["id"]))
+                    ])
+                    self._merge_posts(topic_data, pages)
+                    return topic, topic_data
+                except FetchError as e:
+                    logger.warning(f"Failed to fetch topic {topic['id']}: {e}")
+                    return topic, None
+
+            post_count = 0
+            failed_topics = []
+            tasks = [asyncio.create_task(fetch_topic(topic)) for topic in topics]
+            for i, next_done in enumerate(asyncio.as_completed(tasks)):
+                topic, topic_data = await next_done
+                if topic_data is None:
+                    failed_topics.append(topic)
+                    continue
+                post_count += self._save_topic(topic, topic_data, checkpoint)
+                if i % 50 == 0:
+                    logger.info(f"Processed topic {i+1}/{len(topics)}")
+
+        return post_count, failed_topics
+
+    async def _fetch_all_topics_async(self, fetcher, checkpoint):
+        """Fetch category pages a window at a time until the first empty page.
+
+        Listing resumes after the last page journaled by an interrupted run, and
+        stops early at a page where nothing was bumped since the previous run.
+        """
+        all_topics = checkpoint.listed_topics()
+        if checkpoint.listing_complete:
+            return all_topics
+        page_num = checkpoint.next_page
+        if page_num:
+            logger.info(f"⏩ Resuming category listing at page {page_num}")
+
+        while True:
+            window = range(page_num, page_num + self.MAX_CONCURRENCY)
+            logger.info(f"📦 Fetching pages {window.start}-{window.stop - 1}...")
+            pages = await asyncio.gather(*[
+                fetcher.fetch_json(f"{self.CATEGORY_JSON_URL}?page={n}") for n in window
+            ])
+
+            for page_offset, data in enumerate(pages):
+                topics = data.get("topic_list", {}).get("topics", [])
+                if not topics or checkpoint.is_stale_page(topics):
+                    checkpoint.complete_listing()
+                    logger.info(f"📄 Found {len(all_topics)} total topics across all pages")
+                    return all_topics
+                checkpoint.record_page(window.start + page_offset, topics)
+                all_topics.extend(topics)
+            page_num = window.stop
+
     def _fetch_all_topics(self, page):
         """Fetch all topics from paginated API"""
         all_topics = []
@@ -114,70 +211,142 @@ class TDSDiscourseScraper:
         logger.info(f"📄 Found {len(all_topics)} total topics across all pages")
         return all_topics
 
-    def _process_topics(self, page, all_topics):
-        """Process topics and extract posts within date range"""
-        filtered_posts = []
+    def _process_topics(self, page, all_topics, checkpoint):
+        """Process changed topics within the date range, appending their posts to the output file"""
+        post_count = 0
         
         for i, topic in enumerate(all_topics):
             if i % 10 == 0:
                 logger.info(f"Processing topic {i+1}/{len(all_topics)}")
                 
-            created_at = self.parse_date(topic["created_at"])
-            if not (self.DATE_FROM <= created_at <= self.DATE_TO):
+            if not self._in_date_range(topic) or not checkpoint.is_changed(topic):
                 continue
 
-            topic_url = f"{self.BASE_URL}/t/{topic['slug']}/{topic['id']}.json"
-            page.goto(topic_url)
-            
             try:
-                try:
-                    topic_data = json.loads(page.inner_text("pre"))
-                except:
-                    topic_data = json.loads(page.content())
+                topic_data = self._goto_json(page, self._topic_json_url(topic))
+                missing_urls = self._missing_posts_urls(topic, topic_data, checkpoint.last_post_id(topic["id"]))
+                self._merge_posts(topic_data, [self._goto_json(page, url) for url in missing_urls])
             except json.JSONDecodeError:
                 logger.warning(f"Failed to parse topic data for {topic['id']}")
+                checkpoint.record_retry(topic)
                 continue
 
-            posts = topic_data.get("post_stream", {}).get("posts", [])
-            accepted_answer_id = topic_data.get("accepted_answer", 
-                                               topic_data.get("accepted_answer_post_id"))
+            post_count += self._save_topic(topic, topic_data, checkpoint)
 
-            # Build reply count map
-            reply_counter = {}
-            for post in posts:
-                reply_to = post.get("reply_to_post_number")
-                if reply_to is not None:
-                    reply_counter[reply_to] = reply_counter.get(reply_to, 0) + 1
+        return post_count
 
-            # Process each post
-            for post in posts:
-                filtered_posts.append({
-                    "topic_id": topic["id"],
-                    "topic_title": topic.get("title"),
-                    "category_id": topic.get("category_id"),
-                    "tags": topic.get("tags", []),
-                    "post_id": post["id"],
-                    "post_number": post["post_number"],
-                    "author": post["username"],
-                    "created_at": post["created_at"],
-                    "updated_at": post.get("updated_at"),
-                    "reply_to_post_number": post.get("reply_to_post_number"),
-                    "is_reply": post.get("reply_to_post_number") is not None,
-                    "reply_count": reply_counter.get(post["post_number"], 0),
-                    "like_count": post.get("like_count", 0),
-                    "is_accepted_answer": post["id"] == accepted_answer_id,
-                    "mentioned_users": [u["username"] for u in post.get("mentioned_users", [])],
-                    "url": f"{self.BASE_URL}/t/{topic['slug']}/{topic['id']}/{post['post_number']}",
-                    "content": BeautifulSoup(post["cooked"], "html.parser").get_text()
-                })
-
-        return filtered_posts
+    def _goto_json(self, page, url):
+        page.goto(url)
+        try:
+            return json.loads(page.inner_text("pre"))
+        except:
+            return json.loads(page.content())
+
+    def _with_retries(self, all_topics, checkpoint):
+        """Add topics left incomplete by earlier runs, which an early-stopping listing may not reach"""
+        listed = {topic["id"] for topic in all_topics}
+        return all_topics + [topic for topic in checkpoint.retry_topics() if topic["id"] not in listed]
+
+    def _missing_posts_urls(self, topic, topic_data, after_id=0):
+        """posts.json URLs for stream ids above ``after_id`` that the topic document did not embed.
+
+        Post ids only grow, so for a topic already scraped up to ``after_id``
+        this fetches just its new posts rather than the whole stream.
+        """
+        post_stream = topic_data.get("post_stream", {})
+        loaded = {post["id"] for post in post_stream.get("posts", [])}
+        missing = [post_id for post_id in post_stream.get("stream", [])
+                   if post_id > after_id and post_id not in loaded]
+        return [f"{self.BASE_URL}/t/{topic['id']}/posts.json?"
+                + urlencode([("post_ids[]", post_id) for post_id in missing[i:i + POSTS_PER_REQUEST]])
+                for i in range(0, len(missing), POSTS_PER_REQUEST)]
+
+    def _merge_posts(self, topic_data, pages):
+        """Add the posts fetched by id to the topic document, in post order"""
+        posts = topic_data.setdefault("post_stream", {}).setdefault("posts", [])
+        for page in pages:
+            posts.extend(page.get("post_stream", {}).get("posts", []))
+        posts.sort(key=lambda post: post["post_number"])
+
+    def _save_topic(self, topic, topic_data, checkpoint):
+        """Append posts newer than the checkpoint, then record how far the topic got"""
+        seen_up_to = checkpoint.highest_post_number(topic["id"])
+        after_id = checkpoint.last_post_id(topic["id"])
+        post_stream = topic_data.get("post_stream", {})
+        loaded = {post["id"] for post in post_stream.get("posts", [])}
+        wanted = sorted(post_id for post_id in post_stream.get("stream", []) if post_id > after_id)
+
+        # Save only up to the first new post that failed to load, so the gap is fetched again next run
+        gaps = [post_id for post_id in wanted if post_id not in loaded]
+        saved_up_to = gaps[0] - 1 if gaps else max(wanted + list(loaded) + [after_id])
+        topic_posts = [post for post in self._build_topic_posts(topic, topic_data)
+                       if post["post_number"] > seen_up_to and after_id < post["post_id"] <= saved_up_to]
+        if topic_posts:
+            offset = os.path.getsize(self.OUTPUT_FILE) if os.path.exists(self.OUTPUT_FILE) else 0
+            checkpoint.begin_write(topic["id"], offset)
+            self._save_posts(topic_posts)
+
+        highest = max([post["post_number"] for post in topic_posts] + [seen_up_to])
+        last_post_id = max([post["post_id"] for post in topic_posts] + [after_id])
+        if gaps:
+            logger.warning(f"Topic {topic['id']} is missing {len(gaps)} posts; it will be retried next run")
+        checkpoint.record_topic(topic, topic_data.get("last_posted_at", topic.get("last_posted_at")),
+                                highest, last_post_id, complete=not gaps)
+        return len(topic_posts)
+
+    def _in_date_range(self, topic):
+        created_at = self.parse_date(topic["created_at"])
+        return self.DATE_FROM <= created_at <= self.DATE_TO
+
+    def _topic_json_url(self, topic):
+        return f"{self.BASE_URL}/t/{topic['slug']}/{topic['id']}.json"
+
+    def _build_topic_posts(self, topic, topic_data):
+        """Flatten a topic JSON document into per-post records"""
+        posts = topic_data.get("post_stream", {}).get("posts", [])
+        accepted_answer_id = topic_data.get("accepted_answer", 
+                                           topic_data.get("accepted_answer_post_id"))
+
+        # Build reply count map
+        reply_counter = {}
+        for post in posts:
+            reply_to = post.get("reply_to_post_number")
+            if reply_to is not None:
+                reply_counter[reply_to] = reply_counter.get(reply_to, 0) + 1
+
+        # Process each post
+        topic_posts = []
+        for post in posts:
+            topic_posts.append({
+                "topic_id": topic["id"],
+                "topic_title": topic.get("title"),
+                "category_id": topic.get("category_id"),
+                "tags": topic.get("tags", []),
+                "post_id": post["id"],
+                "post_number": post["post_number"],
+                "author": post["username"],
+                "created_at": post["created_at"],
+                "updated_at": post.get("updated_at"),
+                "reply_to_post_number": post.get("reply_to_post_number"),
+                "is_reply": post.get("reply_to_post_number") is not None,
+                "reply_count": reply_counter.get(post["post_number"], 0),
+                "like_count": post.get("like_count", 0),
+                "is_accepted_answer": post["id"] == accepted_answer_id,
+                "mentioned_users": [u["username"] for u in post.get("mentioned_users", [])],
+                "url": f"{self.BASE_URL}/t/{topic['slug']}/{topic['id']}/{post['post_number']}",
+                "content": BeautifulSoup(post["cooked"], "html.parser").get_text()
+            })
+
+        return topic_posts
 
     def _save_posts(self, posts):
-        """Save posts to JSON file"""
-        with open(self.OUTPUT_FILE, "w", encoding='utf-8') as f:
-            json.dump(posts, f, indent=2, ensure_ascii=False)
-        logger.info(f"💾 Saved posts to {self.OUTPUT_FILE}")
+        """Append posts to the JSONL output file, one record per line"""
+        with open(self.OUTPUT_FILE, "a", encoding='utf-8') as f:
+            for post in posts:
+                f.write(json.dumps(post, ensure_ascii=False))
+                f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
 
     def run(self):
         """Main execution function"""
@@ -198,14 +367,50 @@ class TDSDiscourseScraper:
                     logger.info("✅ Using existing authenticated session.")
                     browser.close()
 
-            # Scrape posts
-            return self.scrape_posts(p)
+        # A full (non-incremental) scrape starts from an empty checkpoint and output file
+        if not self.INCREMENTAL and os.path.exists(self.CHECKPOINT_FILE):
+            os.remove(self.CHECKPOINT_FILE)
+        checkpoint = ScrapeCheckpoint(self.CHECKPOINT_FILE)
+        if checkpoint.is_empty:
+            open(self.OUTPUT_FILE, "w", encoding='utf-8').close()
+        elif checkpoint.pending_write and os.path.exists(self.OUTPUT_FILE):
+            # The last run crashed between appending a topic's posts and recording them; drop those posts
+            pending = checkpoint.pending_write
+            logger.info(f"↩️ Rolling back unrecorded posts of topic {pending['id']}")
+            with open(self.OUTPUT_FILE, "r+b") as f:
+                f.truncate(min(pending["offset"], os.path.getsize(self.OUTPUT_FILE)))
+        if checkpoint.start_run():
+            logger.info("⏩ Resuming interrupted scrape from checkpoint")
+
+        # Scrape posts over pooled HTTP, using the browser only for what HTTP could not fetch
+        try:
+            post_count, failed_topics = asyncio.run(self.scrape_posts_async(checkpoint))
+        except FetchError as e:
+            logger.warning(f"⚠️ HTTP scrape failed ({e}). Falling back to browser navigation...")
+            failed_topics = []
+            with sync_playwright() as p:
+                post_count = self.scrape_posts(p, checkpoint)
+
+        if failed_topics:
+            with sync_playwright() as p:
+                post_count += self.scrape_topics_with_browser(p, failed_topics, checkpoint)
+
+        checkpoint.finish_run()
+
+        logger.info(f"✅ Scraped {post_count} posts between {self.DATE_FROM.date()} and {self.DATE_TO.date()}")
+        logger.info(f"💾 Saved posts to {self.OUTPUT_FILE}")
+        return post_count
 
 def main():
     """Main function for standalone execution"""
-    scraper = TDSDiscourseScraper()
-    posts = scraper.run()
-    print(f"Successfully scraped {len(posts)} posts!")
+    parser = argparse.ArgumentParser(description="Scrape TDS Discourse posts")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore the checkpoint and rescrape everything from page 0")
+    args = parser.parse_args()
+
+    scraper = TDSDiscourseScraper(incremental=not args.full)
+    post_count = scraper.run()
+    print(f"Successfully scraped {post_count} new posts!")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,14 +3,58 @@
 Script to process scraped data into searchable format
 """
 
+import argparse
 import os
-from src.data_processor import DataProcessor
+import sys
+
+# Add src directory to path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from data_processor import DataProcessor, DEFAULT_BATCH_SIZE, peak_memory_mb
+from chunker import Chunker, DEFAULT_MAX_TOKENS, DEFAULT_MIN_TOKENS, DEFAULT_OVERLAP_TOKENS
+from embedding_cache import EmbeddingCache
+from ann_index import IVFIndex, DEFAULT_NPROBE
+from metadata_index import MetadataIndex
 
 def main():
-    processor = DataProcessor()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--output', default='data/processed_data',
+                        help='Output prefix for the embedding store (.npy + .meta.json)')
+    parser.add_argument('--discourse-file', default='data/raw/discourse_posts.jsonl',
+                        help='Scraped Discourse posts (JSONL, or a legacy JSON array dump)')
+    parser.add_argument('--dtype', choices=['float32', 'float16'], default='float32',
+                        help='On-disk precision of the embedding matrix')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='Texts per model.encode batch')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processes used for parsing and chunking (default: all cores)')
+    parser.add_argument('--encode-processes', type=int, default=1,
+                        help='Processes used for encoding; >1 starts a sentence-transformers worker pool')
+    parser.add_argument('--chunk-max-tokens', type=int, default=DEFAULT_MAX_TOKENS,
+                        help='Upper bound on chunk length; the model truncates beyond 256 word pieces')
+    parser.add_argument('--chunk-min-tokens', type=int, default=DEFAULT_MIN_TOKENS,
+                        help='Markdown sections shorter than this are folded into the next one')
+    parser.add_argument('--chunk-overlap-tokens', type=int, default=DEFAULT_OVERLAP_TOKENS,
+                        help='Trailing text repeated at the start of the next chunk of a split section or post')
+    parser.add_argument('--embedding-cache', default='data/embedding_cache.sqlite',
+                        help='Chunk embedding cache; only new or changed chunks are re-encoded')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Re-encode every chunk without reading or updating the cache')
+    parser.add_argument('--build-ivf', action='store_true',
+                        help='Also build an IVF approximate nearest-neighbour index')
+    parser.add_argument('--ivf-lists', type=int, default=None,
+                        help='Number of IVF lists (default: 4 * sqrt(corpus size))')
+    parser.add_argument('--ivf-nprobe', type=int, default=DEFAULT_NPROBE,
+                        help='Default number of lists probed per query')
+    args = parser.parse_args()
+
+    chunker = Chunker(max_tokens=args.chunk_max_tokens, min_tokens=args.chunk_min_tokens,
+                      overlap_tokens=args.chunk_overlap_tokens)
+    processor = DataProcessor(batch_size=args.batch_size, workers=args.workers,
+                              encode_processes=args.encode_processes, chunker=chunker)
     
     print("Processing discourse data...")
-    discourse_data = processor.process_discourse_data('data/discourse_posts.json')
+    discourse_data = processor.process_discourse_data(args.discourse_file)
     print(f"Processed {len(discourse_data)} discourse posts")
     
     print("Processing course content...")
@@ -22,15 +66,46 @@ def main():
     print(f"Total data points: {len(all_data)}")
     
     print("Creating embeddings...")
-    processor.create_embeddings(all_data)
+    cache = None if args.no_cache else EmbeddingCache(args.embedding_cache)
+    stats = processor.create_embeddings(all_data, cache=cache)
+    print(f"Chunks reused: {stats['reused']}, added: {stats['added']}, removed: {stats['removed']}")
+
+    timings = processor.stats
+    if timings['chunking_seconds']:
+        print(f"Chunking: {timings['chunks']} chunks in {timings['chunking_seconds']:.2f}s "
+              f"({timings['chunks'] / timings['chunking_seconds']:.0f} chunks/sec, {processor.workers} workers)")
+    if timings['encode_seconds']:
+        print(f"Encoding: {timings['encoded_chunks']} chunks in {timings['encode_seconds']:.2f}s "
+              f"({timings['encoded_chunks'] / timings['encode_seconds']:.1f} chunks/sec, batch size {processor.batch_size})")
+    peak = peak_memory_mb()
+    print(f"Peak memory: {peak['self']:.0f} MB (largest worker process: {peak['children']:.0f} MB)")
+    if cache is not None:
+        cache.close()
     
     # Ensure data directory exists
     os.makedirs('data', exist_ok=True)
     
+    def build_side_indexes(store):
+        print(f"Built BM25 lexical index in {processor.stats['lexical_seconds']:.2f}s")
+
+        print("Building metadata filter index...")
+        filters = MetadataIndex.build(store.records, data_version=store.data_version)
+        filters.save(args.output)
+        print(f"Indexed filter fields: {', '.join(list(filters.postings) + list(filters.ranges))}")
+
+        if args.build_ivf:
+            print("Building IVF index...")
+            index = IVFIndex.build(store.embeddings, n_lists=args.ivf_lists, data_version=store.data_version)
+            index.nprobe = args.ivf_nprobe
+            index.save(args.output)
+            print(f"Saved IVF index with {index.n_lists} lists (nprobe={index.nprobe})")
+
+    # Side indexes are written before the store's metadata file, which a running server watches
     print("Saving processed data...")
-    processor.save_processed_data('data/processed_data.json')
+    header = processor.save_processed_data(args.output, dtype=args.dtype, side_indexes=build_side_indexes)
+    print(f"Saved {header['shape'][0]} embeddings ({header['dtype']}), data version {header['data_version']}")
     
     print("Data processing complete!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
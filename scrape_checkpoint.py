@@ -0,0 +1,192 @@
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+# Only the fields needed to decide and fetch changes are journaled for a topic
+TOPIC_FIELDS = ('id', 'slug', 'title', 'category_id', 'tags', 'created_at',
+                'bumped_at', 'last_posted_at', 'highest_post_number')
+
+
+class ScrapeCheckpoint:
+    """Append-only journal of scrape progress, so runs are incremental and resumable.
+
+    Each line is one event: a topic finished (with its ``last_posted_at``,
+    ``highest_post_number`` and last saved post id), a topic to retry, a
+    write to the posts file begun, a category page listed, the listing
+    completed, or a run started/finished. A write begun but never followed by
+    its topic event marks posts the next run must roll back.
+    Replaying the journal gives the per-topic state plus, for an interrupted
+    run, the pages already listed. Topics that failed or were saved only in
+    part stay in a retry set until a run saves them completely, since the
+    listing walk may stop before reaching them again. Finished runs are
+    compacted down to topic state so the file stays small.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.topics: Dict[str, Dict] = {}
+        self.retry: Dict[str, Dict] = {}
+        self.pending_write: Optional[Dict] = None
+        self.pages: Dict[int, List[Dict]] = {}
+        self.listing_complete = False
+        self.run_started_at: Optional[str] = None
+        self.previous_run_started_at: Optional[str] = None
+        self._run_open = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        valid_bytes = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    # A line without its newline was torn by a crash, even if it happens to parse
+                    event = json.loads(line) if line.endswith(b'\n') and line.strip() else None
+                except ValueError:
+                    event = None
+                if event is None and line.strip():
+                    break
+                if event is not None:
+                    self._apply(event)
+                valid_bytes += len(line)
+        if valid_bytes < os.path.getsize(self.path):
+            # Cut the torn tail off, or the next event would be appended onto it and lost on reload
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_bytes)
+
+    def _apply(self, event: Dict):
+        kind = event.get('type')
+        if kind == 'topic':
+            self.topics[str(event['id'])] = {
+                'last_posted_at': event.get('last_posted_at'),
+                'highest_post_number': event.get('highest_post_number', 0),
+                'last_post_id': event.get('last_post_id', 0)
+            }
+            self.retry.pop(str(event['id']), None)
+            self.pending_write = None
+            if event.get('retry'):
+                self.retry[str(event['id'])] = event['retry']
+        elif kind == 'write':
+            self.pending_write = {'id': event['id'], 'offset': event['offset']}
+        elif kind == 'retry':
+            self.retry[str(event['topic']['id'])] = event['topic']
+        elif kind == 'run_start':
+            self._run_open = True
+            self.run_started_at = event['started_at']
+            self.pages = {}
+            self.listing_complete = False
+        elif kind == 'page':
+            self.pages[event['page']] = event['topics']
+        elif kind == 'listing_complete':
+            self.listing_complete = True
+        elif kind == 'run_finished':
+            self._run_open = False
+            self.previous_run_started_at = event['started_at']
+            self.pages = {}
+            self.listing_complete = False
+
+    def _append(self, event: Dict):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(event, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._apply(event)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.topics and not self._run_open
+
+    def start_run(self) -> bool:
+        """Begin a run; returns True when resuming an interrupted one"""
+        if self._run_open:
+            return True
+        self._append({'type': 'run_start', 'started_at': datetime.now(timezone.utc).isoformat()})
+        return False
+
+    @property
+    def next_page(self) -> int:
+        return max(self.pages) + 1 if self.pages else 0
+
+    def listed_topics(self) -> List[Dict]:
+        return [topic for page in sorted(self.pages) for topic in self.pages[page]]
+
+    def record_page(self, page: int, topics: List[Dict]):
+        self._append({'type': 'page', 'page': page, 'topics': [_topic_fields(topic) for topic in topics]})
+
+    def complete_listing(self):
+        self._append({'type': 'listing_complete'})
+
+    def highest_post_number(self, topic_id) -> int:
+        return self.topics.get(str(topic_id), {}).get('highest_post_number', 0) or 0
+
+    def last_post_id(self, topic_id) -> int:
+        """Id of the newest saved post; post ids only grow, so anything above it is new"""
+        return self.topics.get(str(topic_id), {}).get('last_post_id', 0) or 0
+
+    def retry_topics(self) -> List[Dict]:
+        return list(self.retry.values())
+
+    def is_changed(self, topic: Dict) -> bool:
+        """True if the topic is new, awaiting a retry, or has activity since it was last scraped"""
+        seen = self.topics.get(str(topic['id']))
+        if seen is None or str(topic['id']) in self.retry:
+            return True
+        return (topic.get('last_posted_at') != seen['last_posted_at']
+                or (topic.get('highest_post_number') or 0) > (seen['highest_post_number'] or 0))
+
+    def is_stale_page(self, topics: List[Dict]) -> bool:
+        """True if every topic on a listing page was last bumped before the previous run started"""
+        if not self.previous_run_started_at or not topics:
+            return False
+        cutoff = _parse_timestamp(self.previous_run_started_at)
+        for topic in topics:
+            bumped_at = topic.get('bumped_at') or topic.get('last_posted_at')
+            if not bumped_at or _parse_timestamp(bumped_at) >= cutoff:
+                return False
+        return True
+
+    def begin_write(self, topic_id, offset: int):
+        """Journal the posts file size before appending a topic's posts, so a crash can be rolled back"""
+        self._append({'type': 'write', 'id': topic_id, 'offset': offset})
+
+    def record_topic(self, topic: Dict, last_posted_at: Optional[str], highest_post_number: int,
+                     last_post_id: int, complete: bool = True):
+        """Record the posts saved for a topic; an incomplete one is retried next run in the same event"""
+        event = {'type': 'topic', 'id': topic['id'], 'last_posted_at': last_posted_at,
+                 'highest_post_number': highest_post_number, 'last_post_id': last_post_id}
+        if not complete:
+            event['retry'] = _topic_fields(topic)
+        self._append(event)
+
+    def record_retry(self, topic: Dict):
+        """Mark a topic that could not be fetched, so the next run fetches it regardless of listing"""
+        self._append({'type': 'retry', 'topic': _topic_fields(topic)})
+
+    def finish_run(self):
+        """Close the run and compact the journal down to per-topic state"""
+        started_at = self.run_started_at
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for topic_id, state in self.topics.items():
+                f.write(json.dumps({'type': 'topic', 'id': topic_id, **state}, ensure_ascii=False) + '\n')
+            for topic in self.retry.values():
+                f.write(json.dumps({'type': 'retry', 'topic': topic}, ensure_ascii=False) + '\n')
+            f.write(json.dumps({'type': 'run_finished', 'started_at': started_at}) + '\n')
+        os.replace(tmp_path, self.path)
+        self._apply({'type': 'run_finished', 'started_at': started_at})
+
+
+def _topic_fields(topic: Dict) -> Dict:
+    return {key: topic.get(key) for key in TOPIC_FIELDS}
+
+
+def _parse_timestamp(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
@@ -0,0 +1,188 @@
+import json
+import os
+from typing import List, Tuple, Optional
+
+import numpy as np
+
+from embedding_store import normalize_rows
+
+IVF_SUFFIX = '.ivf.npz'
+DEFAULT_NPROBE = 16
+ASSIGN_CHUNK_ROWS = 65536
+
+
+def _empty_result() -> Tuple[np.ndarray, np.ndarray]:
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+
+def search_rows(embeddings: np.ndarray, query_embeddings: np.ndarray, rows: np.ndarray,
+                top_k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Exact search restricted to ``rows``: only that subset of the matrix is read and scored"""
+    if len(rows) == 0:
+        return [_empty_result() for _ in query_embeddings]
+    subset = embeddings[rows]
+    results = []
+    for scores in query_embeddings @ subset.T:
+        best = top_k_desc(scores, top_k)
+        results.append((rows[best], scores[best]))
+    return results
+
+
+def top_k_desc(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Positions of the top-k scores, best first"""
+    k = min(top_k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+class ExactIndex:
+    """Brute-force scoring of every row; the reference the approximate index is measured against"""
+
+    mode = 'exact'
+
+    def __init__(self, embeddings: np.ndarray):
+        self.embeddings = embeddings
+
+    def search(self, query_embeddings: np.ndarray, top_k: int,
+               rows: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Return (row ids, scores) per query, best first, optionally only over ``rows``"""
+        query_embeddings = np.atleast_2d(query_embeddings)
+        if rows is not None:
+            return search_rows(self.embeddings, query_embeddings, rows, top_k)
+        if len(self.embeddings) == 0:
+            return [_empty_result() for _ in query_embeddings]
+
+        results = []
+        for scores in query_embeddings @ self.embeddings.T:
+            ids = top_k_desc(scores, top_k)
+            results.append((ids, scores[ids]))
+        return results
+
+
+class IVFIndex:
+    """Inverted-file index: rows are bucketed by nearest k-means centroid and a
+    query only scores the rows in its ``nprobe`` closest buckets.
+    """
+
+    mode = 'approximate'
+
+    def __init__(self, embeddings: np.ndarray, centroids: np.ndarray, list_offsets: np.ndarray,
+                 list_ids: np.ndarray, nprobe: int = DEFAULT_NPROBE, data_version: str = ''):
+        self.embeddings = embeddings
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.nprobe = nprobe
+        self.data_version = data_version
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, n_lists: Optional[int] = None, n_iter: int = 10,
+              max_train_rows: int = 256, seed: int = 0, data_version: str = '') -> 'IVFIndex':
+        """Train centroids with spherical k-means and bucket every row.
+
+        ``max_train_rows`` is per list: training uses at most that many sampled
+        rows per centroid, which keeps build time flat for very large corpora.
+        """
+        n_rows = len(embeddings)
+        if n_rows == 0:
+            raise ValueError("Cannot build an IVF index over an empty corpus")
+        if n_lists is None:
+            n_lists = int(4 * np.sqrt(n_rows))
+        n_lists = max(1, min(n_lists, n_rows))
+
+        rng = np.random.default_rng(seed)
+        train_size = min(n_rows, n_lists * max_train_rows)
+        train_ids = np.sort(rng.choice(n_rows, train_size, replace=False))
+        train = np.asarray(embeddings[train_ids], dtype=np.float32)
+        centroids = _spherical_kmeans(train, n_lists, n_iter, rng)
+
+        assignments = _assign(embeddings, centroids)
+        list_ids = np.argsort(assignments, kind='stable').astype(np.int64)
+        counts = np.bincount(assignments, minlength=n_lists)
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        return cls(embeddings, centroids, list_offsets, list_ids, data_version=data_version)
+
+    def search(self, query_embeddings: np.ndarray, top_k: int, nprobe: Optional[int] = None,
+               rows: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Return (row ids, scores) per query, best first, optionally only over ``rows``"""
+        query_embeddings = np.atleast_2d(query_embeddings)
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+
+        allowed = None
+        if rows is not None:
+            # A filter smaller than the probed lists is cheaper (and exact) to scan directly
+            if len(rows) <= len(self.embeddings) * nprobe / self.n_lists:
+                return search_rows(self.embeddings, query_embeddings, rows, top_k)
+            allowed = np.zeros(len(self.embeddings), dtype=bool)
+            allowed[rows] = True
+
+        results = []
+        for query, centroid_scores in zip(query_embeddings, query_embeddings @ self.centroids.T):
+            probe_lists = top_k_desc(centroid_scores, nprobe)
+            candidates = np.concatenate([
+                self.list_ids[self.list_offsets[lst]:self.list_offsets[lst + 1]] for lst in probe_lists
+            ])
+            if allowed is not None:
+                candidates = candidates[allowed[candidates]]
+            if len(candidates) == 0:
+                results.append((candidates, np.empty(0, dtype=np.float32)))
+                continue
+            scores = self.embeddings[candidates] @ query
+            best = top_k_desc(scores, top_k)
+            results.append((candidates[best], scores[best]))
+        return results
+
+    def save(self, prefix: str):
+        """Write centroids and inverted lists next to the embedding store"""
+        header = {'n_lists': self.n_lists, 'nprobe': self.nprobe, 'data_version': self.data_version}
+        tmp_path = f"{prefix}{IVF_SUFFIX}.tmp-{os.getpid()}.npz"
+        np.savez(tmp_path, centroids=self.centroids, list_offsets=self.list_offsets,
+                 list_ids=self.list_ids, header=np.array(json.dumps(header)))
+        os.replace(tmp_path, prefix + IVF_SUFFIX)
+
+    @staticmethod
+    def exists(prefix: str) -> bool:
+        return os.path.exists(prefix + IVF_SUFFIX)
+
+    @classmethod
+    def load(cls, prefix: str, embeddings: np.ndarray, nprobe: Optional[int] = None) -> 'IVFIndex':
+        with np.load(prefix + IVF_SUFFIX, allow_pickle=False) as data:
+            header = json.loads(str(data['header']))
+            return cls(embeddings, data['centroids'], data['list_offsets'], data['list_ids'],
+                       nprobe=nprobe or header['nprobe'], data_version=header['data_version'])
+
+
+def _assign(embeddings: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid per row, computed in chunks to bound memory"""
+    assignments = np.empty(len(embeddings), dtype=np.int64)
+    for start in range(0, len(embeddings), ASSIGN_CHUNK_ROWS):
+        chunk = np.asarray(embeddings[start:start + ASSIGN_CHUNK_ROWS], dtype=np.float32)
+        assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+
+def _spherical_kmeans(data: np.ndarray, n_clusters: int, n_iter: int,
+                      rng: np.random.Generator) -> np.ndarray:
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignments = _assign(data, centroids)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        order = np.argsort(assignments, kind='stable')
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        nonempty = counts > 0
+
+        sums = np.zeros_like(centroids)
+        sums[nonempty] = np.add.reduceat(data[order], starts[nonempty], axis=0)
+        # Re-seed empty clusters from random rows so every list stays useful
+        n_empty = int((~nonempty).sum())
+        if n_empty:
+            sums[~nonempty] = data[rng.choice(len(data), n_empty, replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
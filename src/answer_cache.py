@@ -0,0 +1,277 @@
+import hashlib
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from image_processor import ImageProcessor
+
+EXACT_HIT = 'exact'
+SEMANTIC_HIT = 'semantic'
+
+
+def normalize_question(question: str) -> str:
+    """Case-fold and collapse whitespace/trailing punctuation so trivial rewrites share a key"""
+    question = re.sub(r'\s+', ' ', question.lower()).strip()
+    return question.strip(' ?!.')
+
+
+def image_hash(image_data: Optional[str]) -> str:
+    """Hash the decoded image like ``ImageProcessor`` does, so a data URL and bare base64 share a scope"""
+    if not image_data:
+        return ''
+    try:
+        return hashlib.sha256(ImageProcessor.decode(image_data)).hexdigest()
+    except ValueError:
+        return hashlib.sha256(image_data.encode('utf-8')).hexdigest()
+
+
+class AnswerCache:
+    """Two-level answer cache in front of the LLM.
+
+    Level one is an exact match on the normalised question plus image hash
+    and search filters. Level two compares the query embedding with
+    embeddings of previously answered questions (same image and filters
+    only) and reuses the answer when the cosine
+    similarity clears ``similarity_threshold``. Entries expire after
+    ``ttl_seconds`` and the least recently used entry is evicted beyond
+    ``max_entries``. Every entry belongs to the corpus data version it was
+    answered from and only matches lookups for that version, so requests
+    still served by an old index snapshot during a swap keep their own
+    entries; ``evict_version`` drops a version once no snapshot serves it.
+    With ``db_path`` entries are persisted to SQLite by a
+    background writer thread, so lookups and inserts only touch memory and
+    never block the event loop on disk I/O.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, ttl_seconds: float = 86400,
+                 max_entries: int = 2048, db_path: Optional[str] = None, data_version: str = ''):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.data_version = data_version
+        self.stats = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0}
+
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Dict]' = OrderedDict()
+        # Query embeddings live in a fixed slot matrix so semantic lookup is one matrix-vector product
+        self._matrix: Optional[np.ndarray] = None
+        self._slot_keys = [None] * max_entries
+        # Data version plus image hash per slot; a semantic match must have the same scope
+        self._slot_scopes = np.array([''] * max_entries, dtype=object)
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+
+        self._db = None
+        self._writes: 'queue.Queue[Optional[Tuple[str, tuple]]]' = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, image_hash TEXT, answer TEXT, embedding BLOB, "
+                "created_at REAL, data_version TEXT, filters TEXT NOT NULL DEFAULT '')"
+            )
+            # Files written before answers were scoped by filters lack the column
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(answers)")}
+            if 'filters' not in columns:
+                self._db.execute("ALTER TABLE answers ADD COLUMN filters TEXT NOT NULL DEFAULT ''")
+            self._db.commit()
+            self._load_from_db()
+            self._writer = threading.Thread(target=self._write_loop, name='answer-cache-writer', daemon=True)
+            self._writer.start()
+
+    @classmethod
+    def from_env(cls, data_version: str = '') -> 'AnswerCache':
+        return cls(
+            similarity_threshold=float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.95')),
+            ttl_seconds=float(os.getenv('ANSWER_CACHE_TTL', '86400')),
+            max_entries=int(os.getenv('ANSWER_CACHE_SIZE', '2048')),
+            db_path=os.getenv('ANSWER_CACHE_DB') or None,
+            data_version=data_version
+        )
+
+    @staticmethod
+    def make_key(question: str, image_data: Optional[str] = None, data_version: str = '',
+                 filters: str = '') -> str:
+        raw = f"{normalize_question(question)}\0{image_hash(image_data)}\0{data_version}\0{filters}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _scope(img_hash: str, data_version: str, filters: str) -> str:
+        return f"{data_version}\0{img_hash}\0{filters}"
+
+    def evict_version(self, data_version: str):
+        """Drop the entries answered from a corpus version that is no longer served"""
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry['data_version'] == data_version]:
+                self._remove(key, delete_row=False)
+            self._persist("DELETE FROM answers WHERE data_version = ?", (data_version,))
+
+    def get(self, question: str, image_data: Optional[str] = None,
+            query_embedding: Optional[np.ndarray] = None, data_version: Optional[str] = None,
+            filters: str = '') -> Tuple[Optional[str], Optional[str]]:
+        """Return (answer, hit type) or (None, None) on a miss.
+
+        Only entries for ``data_version`` and the same ``filters`` (canonical
+        JSON, '' when unfiltered) can match.
+        """
+        data_version = self.data_version if data_version is None else data_version
+        key = self.make_key(question, image_data, data_version, filters)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry, now):
+                self._entries.move_to_end(key)
+                self.stats['exact_hits'] += 1
+                return entry['answer'], EXACT_HIT
+
+            if query_embedding is not None and self._matrix is not None:
+                scope = self._scope(image_hash(image_data), data_version, filters)
+                match = self._nearest(query_embedding, scope, now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.stats['semantic_hits'] += 1
+                    return self._entries[match]['answer'], SEMANTIC_HIT
+
+            self.stats['misses'] += 1
+            return None, None
+
+    def put(self, question: str, answer: str, image_data: Optional[str] = None,
+            query_embedding: Optional[np.ndarray] = None, created_at: Optional[float] = None,
+            data_version: Optional[str] = None, filters: str = ''):
+        data_version = self.data_version if data_version is None else data_version
+        key = self.make_key(question, image_data, data_version, filters)
+        created_at = created_at or time.time()
+        embedding = None
+        if query_embedding is not None:
+            embedding = np.asarray(query_embedding, dtype=np.float32).ravel()
+
+        with self._lock:
+            self._insert(key, image_hash(image_data), answer, embedding, created_at, data_version, filters)
+            self._persist(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, image_hash(image_data), answer,
+                 embedding.tobytes() if embedding is not None else None, created_at, data_version, filters)
+            )
+
+    def flush(self):
+        """Block until every queued SQLite write has been committed"""
+        if self._writer is not None:
+            self._writes.join()
+
+    def close(self):
+        """Commit pending writes, stop the writer thread and close the database"""
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def hit_rate(self) -> float:
+        total = sum(self.stats.values())
+        return (self.stats['exact_hits'] + self.stats['semantic_hits']) / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expired(self, entry: Dict, now: float) -> bool:
+        if now - entry['created_at'] <= self.ttl_seconds:
+            return False
+        self._remove(entry['key'])
+        return True
+
+    def _nearest(self, query_embedding: np.ndarray, scope: str, now: float) -> Optional[str]:
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        if query.shape[0] != self._matrix.shape[1]:
+            return None
+        scores = self._matrix @ query
+        # Empty slots and entries for other images or data versions never match
+        scores[self._slot_scopes != scope] = -np.inf
+        for slot in np.argsort(-scores)[:4]:
+            if scores[slot] < self.similarity_threshold:
+                break
+            key = self._slot_keys[slot]
+            if key is not None and not self._expired(self._entries[key], now):
+                return key
+        return None
+
+    def _insert(self, key: str, img_hash: str, answer: str,
+                embedding: Optional[np.ndarray], created_at: float, data_version: str, filters: str):
+        if key in self._entries:
+            self._remove(key, delete_row=False)
+        while len(self._entries) >= self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+        slot = None
+        if embedding is not None:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, embedding.shape[0]), dtype=np.float32)
+            if embedding.shape[0] == self._matrix.shape[1]:
+                slot = self._free_slots.pop()
+                self._matrix[slot] = embedding
+                self._slot_keys[slot] = key
+                self._slot_scopes[slot] = self._scope(img_hash, data_version, filters)
+
+        self._entries[key] = {'key': key, 'answer': answer, 'created_at': created_at, 'slot': slot,
+                              'data_version': data_version}
+
+    def _remove(self, key: str, delete_row: bool = True):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        slot = entry['slot']
+        if slot is not None:
+            self._matrix[slot] = 0
+            self._slot_keys[slot] = None
+            self._slot_scopes[slot] = ''
+            self._free_slots.append(slot)
+        if delete_row:
+            self._persist("DELETE FROM answers WHERE key = ?", (key,))
+
+    def _persist(self, sql: str, params: tuple):
+        if self._writer is not None:
+            self._writes.put((sql, params))
+
+    def _write_loop(self):
+        """Apply queued statements in order, committing once per burst rather than per statement"""
+        stop = False
+        while not stop:
+            batch = [self._writes.get()]
+            while True:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                for item in batch:
+                    if item is None:
+                        stop = True
+                        continue
+                    self._db.execute(*item)
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Answer cache write failed: {e}")
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+
+    def _load_from_db(self):
+        cutoff = time.time() - self.ttl_seconds
+        self._db.execute("DELETE FROM answers WHERE created_at < ? OR data_version != ?",
+                         (cutoff, self.data_version))
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT key, image_hash, answer, embedding, created_at, data_version, filters FROM answers "
+            "ORDER BY created_at DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for key, img_hash, answer, blob, created_at, data_version, filters in reversed(rows):
+            embedding = np.frombuffer(blob, dtype=np.float32) if blob else None
+            self._insert(key, img_hash, answer, embedding, created_at, data_version, filters)
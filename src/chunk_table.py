@@ -0,0 +1,162 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+ALIGNMENT = 8
+CATEGORY_MAX_RATIO = 0.5
+
+
+class ChunkTable:
+    """Read-only, column-oriented chunk metadata backed by one memory-mapped file.
+
+    Every field becomes a column of flat arrays: integers, floats and booleans
+    are stored natively, strings as one UTF-8 blob plus offsets, repetitive
+    strings (source, title, url) dictionary-encoded, and anything else as
+    JSON text. Worker processes that open the same file share its pages, and
+    a row is only materialised as a dict when it is accessed.
+    """
+
+    def __init__(self, n_rows: int, columns: Dict[str, Dict[str, Any]]):
+        self.n_rows = n_rows
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def __getitem__(self, index) -> Dict[str, Any]:
+        index = int(index)
+        if index < 0:
+            index += self.n_rows
+        if not 0 <= index < self.n_rows:
+            raise IndexError(index)
+        return {name: self._value(column, index)
+                for name, column in self.columns.items() if column['valid'][index]}
+
+    def __iter__(self):
+        for index in range(self.n_rows):
+            yield self[index]
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.columns)
+
+    def kind(self, name: str) -> str:
+        return self.columns[name]['kind']
+
+    def valid(self, name: str) -> np.ndarray:
+        return self.columns[name]['valid'].astype(bool)
+
+    def values(self, name: str) -> np.ndarray:
+        """Raw array for a numeric/bool column, or the category codes of a dictionary column"""
+        column = self.columns[name]
+        if column['kind'] in ('int', 'float', 'bool'):
+            return column['data']
+        if column['kind'] == 'cat':
+            return column['codes']
+        raise TypeError(f"Column {name!r} of kind {column['kind']!r} has no numeric values")
+
+    def categories(self, name: str) -> List[str]:
+        """Decode a whole dictionary (used when building indexes, not on the query path)"""
+        column = self.columns[name]
+        return [_decode(column['dict_blob'], column['dict_offsets'], i)
+                for i in range(len(column['dict_offsets']) - 1)]
+
+    def strings(self, name: str) -> List[Optional[str]]:
+        """Decode a whole text column (used when building indexes, not on the query path)"""
+        return [self._value(self.columns[name], i) if self.columns[name]['valid'][i] else None
+                for i in range(self.n_rows)]
+
+    def _value(self, column: Dict[str, Any], index: int):
+        kind = column['kind']
+        if kind == 'int':
+            return int(column['data'][index])
+        if kind == 'float':
+            return float(column['data'][index])
+        if kind == 'bool':
+            return bool(column['data'][index])
+        if kind == 'cat':
+            # Decode just this row's entry, so workers keep sharing the mapped dictionary pages
+            return _decode(column['dict_blob'], column['dict_offsets'], column['codes'][index])
+        text = _decode(column['blob'], column['offsets'], index)
+        return json.loads(text) if kind == 'json' else text
+
+    @staticmethod
+    def write(path: str, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Write records column by column; returns the schema needed to open the file"""
+        names = list(dict.fromkeys(name for record in records for name in record))
+        schema = {'n_rows': len(records), 'columns': []}
+
+        with open(path, 'wb') as f:
+            for name in names:
+                values = [record.get(name) for record in records]
+                kind, arrays = _encode_column(values)
+                entry = {'name': name, 'kind': kind, 'arrays': {}}
+                for array_name, array in arrays.items():
+                    padding = (-f.tell()) % ALIGNMENT
+                    f.write(b'\0' * padding)
+                    entry['arrays'][array_name] = [f.tell(), array.dtype.str, len(array)]
+                    f.write(np.ascontiguousarray(array).tobytes())
+                schema['columns'].append(entry)
+        return schema
+
+    @classmethod
+    def open(cls, path: str, schema: Dict[str, Any]) -> 'ChunkTable':
+        """Memory-map a file written by ``write`` without copying any column"""
+        n_rows = schema['n_rows']
+        if os.path.getsize(path) == 0:
+            buffer = np.zeros(0, dtype=np.uint8)
+        else:
+            buffer = np.memmap(path, dtype=np.uint8, mode='r')
+
+        columns = {}
+        for entry in schema['columns']:
+            column = {'name': entry['name'], 'kind': entry['kind']}
+            for array_name, (offset, dtype, count) in entry['arrays'].items():
+                dtype = np.dtype(dtype)
+                column[array_name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+            columns[entry['name']] = column
+        return cls(n_rows, columns)
+
+
+def _decode(blob: np.ndarray, offsets: np.ndarray, index: int) -> str:
+    return blob[offsets[index]:offsets[index + 1]].tobytes().decode('utf-8')
+
+
+def _string_arrays(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return offsets, blob
+
+
+def _encode_column(values: List[Any]) -> Tuple[str, Dict[str, np.ndarray]]:
+    valid = np.array([value is not None for value in values], dtype=np.uint8)
+    present = [value for value in values if value is not None]
+
+    if present and all(isinstance(v, bool) for v in present):
+        data = np.array([bool(v) for v in values], dtype=np.bool_)
+        return 'bool', {'valid': valid, 'data': data}
+    if present and all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        data = np.array([v if v is not None else 0 for v in values], dtype=np.int64)
+        return 'int', {'valid': valid, 'data': data}
+    if present and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        data = np.array([v if v is not None else np.nan for v in values], dtype=np.float64)
+        return 'float', {'valid': valid, 'data': data}
+
+    if all(isinstance(v, str) for v in present):
+        strings = [v if v is not None else '' for v in values]
+        distinct = list(dict.fromkeys(present))
+        if len(distinct) <= max(1, CATEGORY_MAX_RATIO * len(values)):
+            code_of = {value: code for code, value in enumerate(distinct)}
+            codes = np.array([code_of[v] if v is not None else -1 for v in values], dtype=np.int32)
+            dict_offsets, dict_blob = _string_arrays(distinct)
+            return 'cat', {'valid': valid, 'codes': codes, 'dict_offsets': dict_offsets, 'dict_blob': dict_blob}
+        offsets, blob = _string_arrays(strings)
+        return 'str', {'valid': valid, 'offsets': offsets, 'blob': blob}
+
+    strings = [json.dumps(v, ensure_ascii=False, separators=(',', ':')) if v is not None else '' for v in values]
+    offsets, blob = _string_arrays(strings)
+    return 'json', {'valid': valid, 'offsets': offsets, 'blob': blob}
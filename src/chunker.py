@@ -0,0 +1,308 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_MAX_TOKENS = 200
+DEFAULT_MIN_TOKENS = 40
+DEFAULT_OVERLAP_TOKENS = 32
+# all-MiniLM-L6-v2 silently truncates inputs beyond this many word pieces
+MODEL_MAX_TOKENS = 256
+
+_TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+_HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.*?)[\s#]*$')
+_SETEXT_PATTERN = re.compile(r'^ {0,3}(=+|-+)\s*$')
+_FENCE_PATTERN = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+_LINK_PATTERN = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+_FRONT_MATTER_TITLE = re.compile(r'^title:\s*["\']?(.*?)["\']?\s*$')
+_SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+
+def count_tokens(text: str) -> int:
+    """Word/punctuation estimate of the model's token count (word pieces run slightly higher)"""
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+class _Piece:
+    """A unit the packer never splits: a paragraph sentence run, or a (part of a) code block"""
+
+    __slots__ = ('text', 'tokens', 'code', 'separator')
+
+    def __init__(self, text: str, code: bool = False, separator: str = '\n\n'):
+        self.text = text
+        self.tokens = count_tokens(text)
+        self.code = code
+        self.separator = separator
+
+
+class Chunker:
+    """Split markdown and long plain text into chunks of bounded token length.
+
+    Markdown is read line by line: ``#`` lines inside fenced code blocks are
+    not headings, each chunk starts with its heading path (``Page > Section``)
+    so continuation chunks keep their context, sections shorter than
+    ``min_tokens`` are folded into the next one, and longer sections are
+    packed into chunks of at most ``max_tokens`` at paragraph, sentence or
+    code-line boundaries. Consecutive chunks of one section share up to
+    ``overlap_tokens`` of trailing prose; oversized code blocks are split
+    with their fences reopened rather than overlapped.
+    """
+
+    def __init__(self, max_tokens: int = DEFAULT_MAX_TOKENS, min_tokens: int = DEFAULT_MIN_TOKENS,
+                 overlap_tokens: int = DEFAULT_OVERLAP_TOKENS):
+        if not 0 <= overlap_tokens < max_tokens // 2:
+            raise ValueError("overlap_tokens must be non-negative and under half of max_tokens")
+        self.max_tokens = max_tokens
+        self.min_tokens = min_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def chunk_markdown(self, lines: Iterable[str]) -> Iterator[Dict]:
+        """Yield ``{'title', 'heading_path', 'content'}`` chunks from markdown lines"""
+        pending: List[Tuple[str, str]] = []
+        last: Optional[Dict] = None
+        for path, body in _sections(lines):
+            text = '\n'.join(body).strip()
+            # Folded sections keep their own heading as a lead-in line unless the breadcrumb already has it
+            leads = ['\n'.join(part for part in (heading if heading not in path else '', folded) if part)
+                     for heading, folded in pending]
+            merged = '\n\n'.join(lead for lead in leads + [text] if lead)
+            if count_tokens(merged) < self.min_tokens:
+                pending.append((path[-1] if path else '', text))
+                continue
+            text, pending = merged, []
+            for chunk in self._chunk_section(path, text):
+                if last is not None:
+                    yield last
+                last = chunk
+
+        leftover = '\n\n'.join('\n'.join(part for part in lead if part) for lead in pending).strip()
+        if leftover:
+            if last is not None and count_tokens(last['content']) + count_tokens(leftover) <= self.max_tokens:
+                last['content'] += '\n\n' + leftover
+            else:
+                if last is not None:
+                    yield last
+                last = {'title': '', 'heading_path': [], 'content': leftover}
+        if last is not None:
+            yield last
+
+    def split_text(self, text: str) -> List[str]:
+        """Split plain text (e.g. a long forum post) at sentence boundaries, with overlap"""
+        if count_tokens(text) <= self.max_tokens:
+            return [text]
+        pieces = [_Piece(sentence, separator=' ') for sentence in _SENTENCE_PATTERN.split(text) if sentence]
+        return self._pack(self._fit(pieces, self.max_tokens), self.max_tokens)
+
+    def _chunk_section(self, path: List[str], text: str) -> List[Dict]:
+        breadcrumb = ' > '.join(path)
+        budget = self.max_tokens - count_tokens(breadcrumb)
+        budget = max(budget, self.max_tokens // 2)
+        title = path[-1] if path else ''
+        parts = self._pack(self._fit(_blocks(text), budget), budget)
+        return [{'title': title, 'heading_path': list(path),
+                 'content': f"{breadcrumb}\n\n{part}" if breadcrumb else part}
+                for part in parts]
+
+    def _fit(self, pieces: List[_Piece], budget: int) -> List[_Piece]:
+        """Break any piece over ``budget`` into sentences, code lines or, as a last resort, words"""
+        fitted = []
+        for piece in pieces:
+            if piece.tokens <= budget:
+                fitted.append(piece)
+            elif piece.code:
+                fitted.extend(_split_code(piece.text, budget))
+            else:
+                separator = piece.separator
+                for sentence in _SENTENCE_PATTERN.split(piece.text):
+                    sentence_piece = _Piece(sentence, separator=separator)
+                    if sentence_piece.tokens <= budget:
+                        fitted.append(sentence_piece)
+                    else:
+                        fitted.extend(_split_words(sentence, budget, separator))
+                    separator = ' '
+        return fitted
+
+    def _pack(self, pieces: List[_Piece], budget: int) -> List[str]:
+        chunks: List[str] = []
+        current: List[_Piece] = []
+        size = 0
+        for piece in pieces:
+            if current and size + piece.tokens > budget:
+                chunks.append(_join(current))
+                current = self._overlap(current)
+                size = sum(p.tokens for p in current)
+                if size + piece.tokens > budget:
+                    current, size = [], 0
+            current.append(piece)
+            size += piece.tokens
+        if current:
+            chunks.append(_join(current))
+        return chunks
+
+    def _overlap(self, pieces: List[_Piece]) -> List[_Piece]:
+        """Trailing prose sentences of a finished chunk, repeated at the start of the next one"""
+        carried: List[_Piece] = []
+        size = 0
+        for piece in reversed(pieces):
+            if piece.code:
+                break
+            sentences = [s for s in _SENTENCE_PATTERN.split(piece.text) if s]
+            for sentence in reversed(sentences):
+                tokens = count_tokens(sentence)
+                if size + tokens > self.overlap_tokens:
+                    return carried
+                carried.insert(0, _Piece(sentence, separator=' '))
+                size += tokens
+        return carried
+
+
+def _sections(lines: Iterable[str]) -> Iterator[Tuple[List[str], List[str]]]:
+    """Yield (heading path, body lines) per heading, ignoring ``#`` lines inside code fences.
+
+    ATX (``## Title``) and setext (``Title`` over ``===``/``---``) headings
+    both start a section; a front-matter ``title`` becomes the root of the path.
+    """
+    path: List[Tuple[int, str]] = []
+    body: List[str] = []
+    fence: Optional[str] = None
+    front_matter: Optional[bool] = None
+    for line in lines:
+        line = line.rstrip('\n')
+        if front_matter is None:
+            front_matter = line.strip() == '---'
+            if front_matter:
+                continue
+        if front_matter:
+            if line.strip() in ('---', '...'):
+                front_matter = False
+            else:
+                title = _FRONT_MATTER_TITLE.match(line)
+                if title and title.group(1):
+                    path = [(0, title.group(1))]
+            continue
+
+        match = _FENCE_PATTERN.match(line)
+        if fence is not None:
+            if _closes(line, fence):
+                fence = None
+            body.append(line)
+            continue
+        if match:
+            fence = match.group(1)
+            body.append(line)
+            continue
+
+        heading = _HEADING_PATTERN.match(line)
+        setext = _SETEXT_PATTERN.match(line)
+        if heading:
+            level, title = len(heading.group(1)), heading.group(2)
+        elif setext and body and body[-1].strip() and not _SETEXT_PATTERN.match(body[-1]):
+            level, title = (1 if setext.group(1)[0] == '=' else 2), body.pop().strip()
+        else:
+            body.append(line)
+            continue
+
+        yield [title for _, title in path], body
+        body = []
+        title = _LINK_PATTERN.sub(r'\1', title).strip()
+        while path and path[-1][0] >= level:
+            path.pop()
+        if path and path[-1][1].lower().endswith(title.lower()):
+            # "2. Deployment Tools" from the front matter followed by "Deployment Tools": one level, not two
+            path[-1] = (level, path[-1][1])
+        else:
+            path.append((level, title))
+    yield [title for _, title in path], body
+
+
+def _closes(line: str, fence: str) -> bool:
+    """A closing fence uses the opener's character, at least as many times, and nothing else"""
+    marker = line.strip()
+    return len(marker) >= len(fence) and set(marker) == {fence[0]}
+
+
+def _blocks(text: str) -> List[_Piece]:
+    """Paragraphs and whole fenced code blocks of a section body"""
+    blocks: List[_Piece] = []
+    paragraph: List[str] = []
+    code: List[str] = []
+    fence: Optional[str] = None
+
+    def flush_paragraph():
+        if paragraph:
+            blocks.append(_Piece('\n'.join(paragraph)))
+            paragraph.clear()
+
+    for line in text.split('\n'):
+        match = _FENCE_PATTERN.match(line)
+        if fence is not None:
+            code.append(line)
+            if _closes(line, fence):
+                blocks.append(_Piece('\n'.join(code), code=True))
+                code, fence = [], None
+        elif match:
+            flush_paragraph()
+            fence = match.group(1)
+            code = [line]
+        elif line.strip():
+            paragraph.append(line)
+        else:
+            flush_paragraph()
+    flush_paragraph()
+    if code:
+        blocks.append(_Piece('\n'.join(code), code=True))
+    return blocks
+
+
+def _split_code(text: str, budget: int) -> List[_Piece]:
+    """Split an oversized code block by lines, closing and reopening its fence in every part"""
+    lines = text.split('\n')
+    opener = lines[0]
+    fence = _FENCE_PATTERN.match(opener).group(1)
+    has_closer = len(lines) > 1 and _closes(lines[-1], fence)
+    inner = lines[1:-1] if has_closer else lines[1:]
+    overhead = count_tokens(opener) + count_tokens(fence)
+
+    pieces, current, size = [], [], overhead
+    for line in inner:
+        tokens = count_tokens(line)
+        if current and size + tokens > budget:
+            pieces.append(_Piece('\n'.join([opener] + current + [fence]), code=True))
+            current, size = [], overhead
+        current.append(line)
+        size += tokens
+    if current or not pieces:
+        pieces.append(_Piece('\n'.join([opener] + current + [fence]), code=True))
+    # A single line longer than the budget is cut into words like prose
+    fitted = []
+    for piece in pieces:
+        fitted.extend([piece] if piece.tokens <= budget else _split_words(piece.text, budget, '\n\n', code=True))
+    return fitted
+
+
+def _split_words(text: str, budget: int, separator: str, code: bool = False) -> List[_Piece]:
+    pieces, current, size = [], [], 0
+    for word in text.split(' '):
+        tokens = count_tokens(word)
+        if current and size + tokens > budget:
+            pieces.append(_Piece(' '.join(current), code=code, separator=separator if not pieces else ' '))
+            current, size = [], 0
+        current.append(word)
+        size += tokens
+    if current:
+        pieces.append(_Piece(' '.join(current), code=code, separator=separator if not pieces else ' '))
+    return pieces
+
+
+def _join(pieces: List[_Piece]) -> str:
+    parts = [pieces[0].text]
+    for piece in pieces[1:]:
+        parts.append(piece.separator)
+        parts.append(piece.text)
+    return ''.join(parts)
+
+
+def split_record(record: Dict, chunker: Chunker) -> List[Dict]:
+    """Split a record's content with ``split_text``; each part copies the record's other fields"""
+    parts = chunker.split_text(record['content'])
+    if len(parts) == 1:
+        return [record]
+    return [{**record, 'content': part, 'chunk_index': i} for i, part in enumerate(parts)]
@@ -0,0 +1,247 @@
+import hashlib
+import os
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_TOKEN_BUDGET = 1000
+DEFAULT_MAX_ITEM_TOKENS = 300
+DEFAULT_DEDUP_THRESHOLD = 0.8
+MIN_TRUNCATED_TOKENS = 40
+LEGACY_ITEMS = 5
+LEGACY_CONTENT_CHARS = 1000
+MINHASH_PERMUTATIONS = 64
+SHINGLE_WORDS = 3
+TIKTOKEN_ENCODING = 'cl100k_base'
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = np.random.default_rng(1)
+_HASH_A = _rng.integers(1, _MERSENNE_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+_HASH_B = _rng.integers(0, _MERSENNE_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+_WORD_PATTERN = re.compile(r'\w+')
+_TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+_encoding = None
+
+
+def _tiktoken_encoding():
+    """The tiktoken encoding if tiktoken and its data are available, else False (cached)"""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+        except Exception:
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Exact count with tiktoken; otherwise a word/punctuation estimate close to BPE counts for English"""
+    encoding = _tiktoken_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    encoding = _tiktoken_encoding()
+    if encoding:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    matches = list(_TOKEN_PATTERN.finditer(text))
+    return text if len(matches) <= max_tokens else text[:matches[max_tokens - 1].end()]
+
+
+def truncate_parts(parts: List[str], max_tokens: int, separator: str = '\n\n') -> str:
+    """Join parts within ``max_tokens``, giving each an even share; short parts pass their unused share on"""
+    sizes = [count_tokens(part) for part in parts]
+    budget = max_tokens - count_tokens(separator) * (len(parts) - 1)
+    if sum(sizes) <= budget:
+        return separator.join(parts)
+    limits = [0] * len(parts)
+    smallest_first = sorted(range(len(parts)), key=sizes.__getitem__)
+    for n, i in enumerate(smallest_first):
+        limits[i] = min(sizes[i], budget // (len(parts) - n))
+        budget -= limits[i]
+    return separator.join(truncate_to_tokens(part, limit) for part, limit in zip(parts, limits) if limit > 0)
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash over word shingles; equal positions across signatures estimate Jaccard similarity"""
+    words = _WORD_PATTERN.findall(text.lower())
+    shingles = {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    hashes = np.array([int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little')
+                       for s in shingles], dtype=np.uint64) % np.uint64(_MERSENNE_PRIME)
+    # Universal hashing (a*x + b) mod p, one row per permutation; uint64 wraparound is fine for ranking
+    permuted = (_HASH_A[:, None] * hashes[None, :] + _HASH_B[:, None]) % np.uint64(_MERSENNE_PRIME)
+    return permuted.min(axis=1)
+
+
+def format_item(item: Dict, content: str) -> str:
+    return f"Source: {item.get('title', '')}\nURL: {item.get('url', '')}\nContent: {content}"
+
+
+class ContextPacker:
+    """Assemble LLM context under a token budget instead of a fixed item count.
+
+    Retrieved chunks are taken in relevance order. Near-duplicates (MinHash
+    Jaccard estimate at or above ``dedup_threshold``) are dropped, chunks
+    from the same URL with adjacent post numbers (or consecutive chunks of
+    the same page) are merged into one block, and blocks are added until
+    ``token_budget`` is used, truncating the last one if worthwhile. A
+    merged block is truncated member by member, so every retrieved chunk in
+    it keeps a share of the block.
+    """
+
+    def __init__(self, token_budget: int = DEFAULT_TOKEN_BUDGET, max_item_tokens: int = DEFAULT_MAX_ITEM_TOKENS,
+                 dedup_threshold: float = DEFAULT_DEDUP_THRESHOLD):
+        self.token_budget = token_budget
+        self.max_item_tokens = max_item_tokens
+        self.dedup_threshold = dedup_threshold
+
+    @classmethod
+    def from_env(cls) -> 'ContextPacker':
+        return cls(
+            token_budget=int(os.getenv('CONTEXT_TOKEN_BUDGET', str(DEFAULT_TOKEN_BUDGET))),
+            max_item_tokens=int(os.getenv('CONTEXT_MAX_ITEM_TOKENS', str(DEFAULT_MAX_ITEM_TOKENS))),
+            dedup_threshold=float(os.getenv('CONTEXT_DEDUP_THRESHOLD', str(DEFAULT_DEDUP_THRESHOLD)))
+        )
+
+    def deduplicate(self, context: List[Dict]) -> List[Dict]:
+        kept, signatures = [], []
+        for item in context:
+            signature = minhash_signature(item.get('content', ''))
+            if any(np.mean(signature == other) >= self.dedup_threshold for other in signatures):
+                continue
+            kept.append(item)
+            signatures.append(signature)
+        return kept
+
+    @staticmethod
+    def merge_adjacent(context: List[Dict]) -> List[Dict]:
+        """Merge same-URL chunks that are neighbours in the source; each group keeps its best rank.
+
+        A merged block takes its metadata from its best-ranked chunk and lists
+        the members' contents in source order under ``parts``. A part that
+        directly continues the previous one (the next split of the same post or
+        page) drops the heading path and overlap it repeats.
+        """
+        groups: Dict[str, List[List[Dict]]] = {}
+        ordered: List[List[Dict]] = []
+        for item in context:
+            url = item.get('url')
+            runs = groups.setdefault(url, []) if url else None
+            target = None
+            for run in runs or []:
+                if _adjacent(run, item):
+                    target = run
+                    break
+            if target is None:
+                target = [item]
+                ordered.append(target)
+                if runs is not None:
+                    runs.append(target)
+            else:
+                target.append(item)
+
+        merged = []
+        for run in ordered:
+            if len(run) == 1:
+                merged.append(run[0])
+                continue
+            members = sorted(run, key=_order)
+            parts = [members[0].get('content', '')]
+            parts += [_continuation(previous, item) for previous, item in zip(members, members[1:])]
+            merged.append({**run[0], 'content': '\n\n'.join(parts), 'parts': parts})
+        return merged
+
+    def pack(self, context: List[Dict]) -> Dict:
+        """Return the context text plus token accounting against the legacy top-5/1000-char prompt"""
+        unique = self.deduplicate(context)
+        blocks = self.merge_adjacent(unique)
+
+        parts, used = [], 0
+        for item in blocks:
+            remaining = self.token_budget - used
+            if remaining < MIN_TRUNCATED_TOKENS:
+                break
+            header_tokens = count_tokens(format_item(item, ''))
+            allowed = min(self.max_item_tokens, remaining - header_tokens)
+            if allowed < MIN_TRUNCATED_TOKENS:
+                break
+            text = format_item(item, truncate_parts(item.get('parts') or [item.get('content', '')], allowed))
+            parts.append(text)
+            used += count_tokens(text)
+
+        context_text = "\n\n".join(parts)
+        legacy_text = "\n\n".join(format_item(item, f"{item.get('content', '')[:LEGACY_CONTENT_CHARS]}...")
+                                  for item in context[:LEGACY_ITEMS])
+        tokens = count_tokens(context_text)
+        legacy_tokens = count_tokens(legacy_text)
+        return {
+            'text': context_text,
+            'tokens': tokens,
+            'legacy_tokens': legacy_tokens,
+            'saved_tokens': legacy_tokens - tokens,
+            'items': len(parts),
+            'duplicates_dropped': len(context) - len(unique),
+            'chunks_merged': len(unique) - len(blocks),
+        }
+
+
+def _position(item: Dict) -> Optional[int]:
+    """Where a chunk sits in its source: the post number in a topic, or the chunk position in a course page"""
+    if item.get('post_number') is not None:
+        return item['post_number']
+    return item.get('chunk_index')
+
+
+def _order(item: Dict):
+    """Source order: by post (or page chunk), then by part for posts split into several chunks"""
+    return _position(item), item.get('chunk_index') or 0
+
+
+def _continuation(previous: Dict, item: Dict) -> str:
+    """The item's content minus the heading path and overlap it repeats from the chunk just before it"""
+    text = item.get('content', '')
+    index = previous.get('chunk_index')
+    if index is None or item.get('chunk_index') != index + 1 or item.get('post_number') != previous.get('post_number'):
+        return text
+    path = item.get('heading_path') or []
+    breadcrumb = ' > '.join(path) + '\n\n'
+    if path and path == previous.get('heading_path') and text.startswith(breadcrumb):
+        text = text[len(breadcrumb):]
+    return _strip_overlap(previous.get('content', ''), text)
+
+
+def _strip_overlap(previous: str, text: str) -> str:
+    """Drop the longest start of ``text`` that repeats the end of ``previous``, matching whole words only"""
+    for size in range(min(len(previous), len(text)), 0, -1):
+        if size < len(text) and not text[size].isspace():
+            continue
+        if size < len(previous) and not previous[-size - 1].isspace():
+            continue
+        if previous.endswith(text[:size]):
+            return text[size:].lstrip()
+    return text
+
+
+def _adjacent(run: List[Dict], item: Dict) -> bool:
+    positions = [_position(i) for i in run]
+    position = _position(item)
+    if position is None or any(p is None for p in positions):
+        # Chunks from stores written before chunk positions were recorded are never merged
+        return False
+    return min(positions) - 1 <= position <= max(positions) + 1
+
+
+_default_packer: Optional[ContextPacker] = None
+
+
+def default_packer() -> ContextPacker:
+    global _default_packer
+    if _default_packer is None:
+        _default_packer = ContextPacker.from_env()
+    return _default_packer
@@ -1,109 +1,320 @@
 import json
 import os
 import re
-from typing import List, Dict, Any
-from sentence_transformers import SentenceTransformer
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator, TextIO
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from embedding_store import EmbeddingStore, store_prefix
+from embedding_cache import EmbeddingCache, chunk_key
+from lexical_index import LexicalIndex
+from chunker import Chunker, split_record
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+DEFAULT_BATCH_SIZE = 64
+DISCOURSE_BASE_URL = 'https://discourse.onlinedegree.iitm.ac.in'
+READ_BLOCK_SIZE = 1 << 16
+RECORDS_PER_WORKER_BATCH = 256
+
+
+def iter_json_records(path: str) -> Iterator[Dict]:
+    """Stream records from a JSONL file or, for legacy dumps, a top-level JSON array"""
+    with open(path, 'r', encoding='utf-8') as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        if first == '[':
+            yield from _iter_json_array(f)
+            return
+
+        line = first + f.readline()
+        while line:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+            line = f.readline()
+
+
+def _iter_json_array(f: TextIO) -> Iterator[Dict]:
+    """Decode array elements one at a time so the whole dump never sits in memory"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    while True:
+        block = f.read(READ_BLOCK_SIZE)
+        buffer += block
+        while True:
+            buffer = buffer.lstrip(' \t\r\n,')
+            if buffer.startswith(']'):
+                return
+            try:
+                record, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                break
+            yield record
+            buffer = buffer[end:]
+        if not block:
+            raise ValueError("Unterminated JSON array in discourse dump")
+
+
+def _batched(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def clean_post_content(content: str) -> str:
+    # Clean HTML content
+    content = re.sub(r'<[^>]+>', ' ', content)
+    return re.sub(r'\s+', ' ', content).strip()
+
+
+def peak_memory_mb() -> Dict[str, float]:
+    """Peak resident memory (MB) of this process and of its largest finished child.
+
+    The two are reported separately: their peaks need not overlap in time, so
+    their sum is not the peak of the process tree.
+    """
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+            'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale}
+
+
+def process_discourse_record(record: Dict, chunker: Optional[Chunker] = None) -> List[Dict]:
+    """Chunk one record in either the legacy topic schema or the scraper's flat per-post schema"""
+    if 'post_stream' in record:
+        return process_discourse_topic(record, chunker)
+    return process_discourse_post(record, chunker)
+
+
+def process_discourse_post(record: Dict, chunker: Optional[Chunker] = None) -> List[Dict]:
+    """Turn one flat per-post record written by TDSDiscourseScraper into searchable chunks"""
+    content = clean_post_content(record.get('content', '') or '')
+    if len(content) <= 50:  # Only include substantial content
+        return []
+
+    post_number = record.get('post_number', 1)
+    full_url = record.get('url') or ''
+    topic_url = full_url
+    if full_url.endswith(f"/{post_number}"):
+        topic_url = full_url[:-len(f"/{post_number}")]
+    elif not full_url:
+        topic_url = f"{DISCOURSE_BASE_URL}/t/{record.get('topic_slug', '')}/{record.get('topic_id', '')}"
+        full_url = f"{topic_url}/{post_number}"
+
+    return split_record({
+        'content': content,
+        'title': record.get('topic_title') or '',
+        'url': topic_url,
+        'post_number': post_number,
+        'source': 'discourse',
+        'full_url': full_url,
+        'topic_id': record.get('topic_id'),
+        'created_at': record.get('created_at'),
+        'tags': record.get('tags') or [],
+        'like_count': record.get('like_count', 0),
+        'is_accepted_answer': bool(record.get('is_accepted_answer', False))
+    }, chunker or Chunker())
+
+
+def process_discourse_topic(post: Dict, chunker: Optional[Chunker] = None) -> List[Dict]:
+    """Turn one Discourse topic into searchable chunks"""
+    processed_posts = []
+
+    # Extract relevant information
+    topic_title = post.get('topic_title', '')
+    topic_url = f"{DISCOURSE_BASE_URL}/t/{post.get('topic_slug', '')}/{post.get('topic_id', '')}"
+
+    chunker = chunker or Chunker()
+    # Process each post in the topic
+    posts = post.get('post_stream', {}).get('posts', [])
+    for p in posts:
+        content = p.get('cooked', '') or p.get('raw', '')
+        if content:
+            content = clean_post_content(content)
+
+            if len(content) > 50:  # Only include substantial content
+                processed_posts.extend(split_record({
+                    'content': content,
+                    'title': topic_title,
+                    'url': topic_url,
+                    'post_number': p.get('post_number', 1),
+                    'source': 'discourse',
+                    'full_url': f"{topic_url}/{p.get('post_number', 1)}"
+                }, chunker))
+
+    return processed_posts
+
+
+def process_markdown_file(filepath: str, chunker: Optional[Chunker] = None) -> List[Dict]:
+    """Split one markdown course page into size-bounded chunks, streaming it line by line"""
+    filename = os.path.basename(filepath)
+    url = f"https://tds.s-anand.net/#/{filename.replace('.md', '').replace('_', '-').lower()}"
+
+    processed_content = []
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for index, chunk in enumerate((chunker or Chunker()).chunk_markdown(f)):
+            if len(chunk['content']) > 100:
+                processed_content.append({
+                    'content': chunk['content'],
+                    'title': chunk['title'],
+                    'heading_path': chunk['heading_path'],
+                    'chunk_index': index,
+                    'url': url,
+                    'source': 'course_content',
+                    'file': filename
+                })
+
+    return processed_content
+
+
+def encoder_name(model) -> str:
+    """Identity of an injected encoder: its ``name`` if it declares one, else its class and output size"""
+    name = getattr(model, 'name', None)
+    if isinstance(name, str) and name:
+        return name
+    model_class = type(model)
+    return f"{model_class.__module__}.{model_class.__qualname__}/{model.get_sentence_embedding_dimension()}"
+
 
 class DataProcessor:
-    def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, workers: Optional[int] = None,
+                 encode_processes: int = 1, model=None, chunker: Optional[Chunker] = None,
+                 model_name: Optional[str] = None):
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(MODEL_NAME)
+            model_name = model_name or MODEL_NAME
+        self.model = model
+        # Cache keys and the store header name the encoder actually in use, so vectors never mix across models
+        self.model_name = model_name or encoder_name(model)
         self.processed_data = []
         self.embeddings = None
-        
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.encode_processes = encode_processes
+        self.chunker = chunker or Chunker()
+        self.stats = {'chunking_seconds': 0.0, 'chunks': 0, 'encode_seconds': 0.0, 'encoded_chunks': 0,
+                      'lexical_seconds': 0.0}
+
+    def _parallel_chunks(self, func: Callable[[Any], List[Dict]], items: Iterable) -> List[Dict]:
+        """Run a chunking function over items in a process pool, keeping input order.
+
+        Items are consumed in bounded batches, so a generator input is never
+        fully materialised.
+        """
+        start = time.perf_counter()
+        chunks = []
+        pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        try:
+            for batch in _batched(items, self.workers * RECORDS_PER_WORKER_BATCH):
+                if pool is None:
+                    results = map(func, batch)
+                else:
+                    results = pool.map(func, batch, chunksize=RECORDS_PER_WORKER_BATCH // 4)
+                for result in results:
+                    chunks.extend(result)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self.stats['chunking_seconds'] += time.perf_counter() - start
+        self.stats['chunks'] += len(chunks)
+        return chunks
+
     def process_discourse_data(self, discourse_file: str) -> List[Dict]:
-        """Process discourse posts into searchable chunks"""
-        with open(discourse_file, 'r', encoding='utf-8') as f:
-            discourse_data = json.load(f)
-        
-        processed_posts = []
-        
-        for post in discourse_data:
-            # Extract relevant information
-            topic_title = post.get('topic_title', '')
-            topic_url = f"https://discourse.onlinedegree.iitm.ac.in/t/{post.get('topic_slug', '')}/{post.get('topic_id', '')}"
-            
-            # Process each post in the topic
-            posts = post.get('post_stream', {}).get('posts', [])
-            for p in posts:
-                content = p.get('cooked', '') or p.get('raw', '')
-                if content:
-                    # Clean HTML content
-                    content = re.sub(r'<[^>]+>', ' ', content)
-                    content = re.sub(r'\s+', ' ', content).strip()
-                    
-                    if len(content) > 50:  # Only include substantial content
-                        processed_posts.append({
-                            'content': content,
-                            'title': topic_title,
-                            'url': topic_url,
-                            'post_number': p.get('post_number', 1),
-                            'source': 'discourse',
-                            'full_url': f"{topic_url}/{p.get('post_number', 1)}"
-                        })
-        
-        return processed_posts
-    
+        """Process discourse posts (JSONL or legacy JSON array) into searchable chunks.
+
+        Records are streamed from disk, but the returned chunks are all held in memory.
+        """
+        return self._parallel_chunks(partial(process_discourse_record, chunker=self.chunker),
+                                     iter_json_records(discourse_file))
+
     def process_course_content(self, md_folder: str) -> List[Dict]:
         """Process markdown course content"""
-        processed_content = []
-        
-        for filename in os.listdir(md_folder):
-            if filename.endswith('.md'):
-                filepath = os.path.join(md_folder, filename)
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Split content into sections
-                sections = self.split_markdown_content(content)
-                
-                for section in sections:
-                    if len(section['content']) > 100:
-                        processed_content.append({
-                            'content': section['content'],
-                            'title': section['title'],
-                            'url': f"https://tds.s-anand.net/#/{filename.replace('.md', '').replace('_', '-').lower()}",
-                            'source': 'course_content',
-                            'file': filename
-                        })
-        
-        return processed_content
-    
-    def split_markdown_content(self, content: str) -> List[Dict]:
-        """Split markdown content into logical sections"""
-        sections = []
-        lines = content.split('\n')
-        current_section = {'title': '', 'content': ''}
-        
-        for line in lines:
-            if line.startswith('#'):
-                if current_section['content']:
-                    sections.append(current_section)
-                current_section = {
-                    'title': line.strip('#').strip(),
-                    'content': line + '\n'
-                }
-            else:
-                current_section['content'] += line + '\n'
-        
-        if current_section['content']:
-            sections.append(current_section)
-        
-        return sections
-    
-    def create_embeddings(self, data: List[Dict]):
-        """Create embeddings for all content"""
+        filepaths = [
+            os.path.join(md_folder, filename)
+            for filename in sorted(os.listdir(md_folder))
+            if filename.endswith('.md')
+        ]
+        return self._parallel_chunks(partial(process_markdown_file, chunker=self.chunker), filepaths)
+
+    def create_embeddings(self, data: List[Dict], cache: Optional[EmbeddingCache] = None) -> Dict[str, int]:
+        """Create embeddings for all content, encoding only chunks missing from the cache.
+
+        Returns counts of reused, added and removed chunk embeddings.
+        """
         texts = [item['content'] for item in data]
-        self.embeddings = self.model.encode(texts)
         self.processed_data = data
+
+        if cache is None:
+            self.embeddings = self.encode_texts(texts)
+            return {'reused': 0, 'added': len(texts), 'removed': 0}
+
+        keys = [chunk_key(text, self.model_name) for text in texts]
+        vectors = cache.get_many(keys)
+
+        # Identical texts share a key, so each distinct new chunk is encoded once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        if missing:
+            encoded = self.encode_texts(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), encoded))
+            cache.put_many(new_vectors.items())
+            vectors.update(new_vectors)
+
+        removed = cache.prune(keys)
+        self.embeddings = np.stack([vectors[key] for key in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+        return {'reused': len(set(keys)) - len(missing), 'added': len(missing), 'removed': removed}
     
-    def save_processed_data(self, output_file: str):
-        """Save processed data and embeddings"""
-        data_to_save = {
-            'processed_data': self.processed_data,
-            'embeddings': self.embeddings.tolist() if self.embeddings is not None else []
-        }
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(data_to_save, f, indent=2, ensure_ascii=False)
\ No newline at end of file
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Encode texts in fixed-size batches, longest first so each batch pads to similar lengths"""
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        start = time.perf_counter()
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        sorted_texts = [texts[i] for i in order]
+
+        if self.encode_processes > 1:
+            pool = self.model.start_multi_process_pool(['cpu'] * self.encode_processes)
+            try:
+                encoded = self.model.encode_multi_process(sorted_texts, pool, batch_size=self.batch_size)
+            finally:
+                self.model.stop_multi_process_pool(pool)
+        else:
+            encoded = self.model.encode(sorted_texts, batch_size=self.batch_size, convert_to_numpy=True)
+
+        embeddings = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+        embeddings[order] = encoded
+
+        self.stats['encode_seconds'] += time.perf_counter() - start
+        self.stats['encoded_chunks'] += len(texts)
+        return embeddings
+
+    def save_processed_data(self, output_file: str, dtype: str = 'float32',
+                            side_indexes: Optional[Callable[[EmbeddingStore], None]] = None):
+        """Save processed data and embeddings as a binary embedding store, plus its BM25 index.
+
+        The BM25 index and any ``side_indexes`` are written before the store's
+        metadata file, which is what a serving process watches for new data.
+        """
+        embeddings = self.embeddings if self.embeddings is not None else np.zeros((0, 0))
+        prefix = store_prefix(output_file)
+
+        def build_side_indexes(store: EmbeddingStore):
+            start = time.perf_counter()
+            LexicalIndex.build(self.processed_data, data_version=store.data_version).save(prefix)
+            self.stats['lexical_seconds'] += time.perf_counter() - start
+            if side_indexes is not None:
+                side_indexes(store)
+
+        return EmbeddingStore.save(prefix, embeddings, self.processed_data, dtype=dtype,
+                                   model_name=self.model_name, before_publish=build_side_indexes)
\ No newline at end of file
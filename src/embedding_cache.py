@@ -0,0 +1,64 @@
+import hashlib
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+SQLITE_MAX_VARIABLES = 900
+
+
+def chunk_key(text: str, model_name: str) -> str:
+    """Content hash identifying one chunk embedding for one model"""
+    return hashlib.sha256(f"{model_name}\0{text}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent chunk-embedding cache keyed by content hash, stored in SQLite"""
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(db_path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, dim INTEGER, vector BLOB)")
+        self.db.commit()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+            batch = keys[start:start + SQLITE_MAX_VARIABLES]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.db.execute(f"SELECT key, dim, vector FROM embeddings WHERE key IN ({placeholders})", batch)
+            for key, dim, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32)
+                if len(vector) == dim:
+                    found[key] = vector
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, np.ndarray]]):
+        rows = []
+        for key, vector in items:
+            vector = np.asarray(vector, dtype=np.float32)
+            rows.append((key, len(vector), vector.tobytes()))
+        self.db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+        self.db.commit()
+
+    def prune(self, live_keys: Iterable[str]) -> int:
+        """Delete every entry not in ``live_keys``; returns how many were removed"""
+        self.db.execute("CREATE TEMP TABLE IF NOT EXISTS live_keys (key TEXT PRIMARY KEY)")
+        self.db.execute("DELETE FROM live_keys")
+        self.db.executemany("INSERT OR IGNORE INTO live_keys VALUES (?)", ((key,) for key in live_keys))
+        removed = self.db.execute(
+            "DELETE FROM embeddings WHERE key NOT IN (SELECT key FROM live_keys)"
+        ).rowcount
+        self.db.execute("DELETE FROM live_keys")
+        self.db.commit()
+        return removed
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        self.db.close()
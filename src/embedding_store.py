@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+from typing import List, Dict, Any, Callable, Optional
+
+import numpy as np
+
+from chunk_table import ChunkTable
+
+FORMAT_VERSION = 2
+READABLE_VERSIONS = (1, 2)
+EMBEDDINGS_SUFFIX = '.npy'
+METADATA_SUFFIX = '.meta.json'
+CHUNKS_SUFFIX = '.chunks.bin'
+SUPPORTED_DTYPES = ('float32', 'float16')
+
+
+def store_prefix(path: str) -> str:
+    """Strip known artifact extensions so any store file maps to one prefix"""
+    for suffix in (METADATA_SUFFIX, EMBEDDINGS_SUFFIX, '.json'):
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalise each row so cosine similarity becomes a plain dot product"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _atomic_write(path: str, write):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class EmbeddingStore:
+    """Versioned on-disk corpus: a contiguous embedding matrix plus chunk records.
+
+    Embeddings live in ``<prefix>.npy`` and chunk metadata in the columnar
+    ``<prefix>.chunks.bin``; both are memory-mapped on load, so every worker
+    process opening the same store shares one copy in the page cache. The
+    format header lives in ``<prefix>.meta.json``. Version 1 stores, which
+    kept records as a JSON list in the metadata file, can still be read.
+    """
+
+    def __init__(self, embeddings: np.ndarray, records, header: Dict[str, Any]):
+        self.embeddings = embeddings
+        self.records = records
+        self.header = header
+
+    @property
+    def data_version(self) -> str:
+        return self.header.get('data_version', '')
+
+    @property
+    def normalized(self) -> bool:
+        return bool(self.header.get('normalized', False))
+
+    @staticmethod
+    def exists(prefix: str) -> bool:
+        return (os.path.exists(prefix + EMBEDDINGS_SUFFIX)
+                and os.path.exists(prefix + METADATA_SUFFIX))
+
+    @classmethod
+    def save(cls, prefix: str, embeddings: np.ndarray, records: List[Dict],
+             dtype: str = 'float32', model_name: Optional[str] = None,
+             normalize: bool = True,
+             before_publish: Optional[Callable[['EmbeddingStore'], None]] = None) -> Dict[str, Any]:
+        """Write embeddings and records; returns the header that was stored.
+
+        ``before_publish`` receives the new store, opened from its data files,
+        before the metadata file is written, so side indexes built there are on
+        disk by the time a watcher sees the new header.
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype!r}, expected one of {SUPPORTED_DTYPES}")
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2 and matrix.size == 0:
+            matrix = matrix.reshape(0, 0)
+        if matrix.ndim != 2:
+            raise ValueError(f"Expected a 2-D embedding matrix, got shape {matrix.shape}")
+        if matrix.shape[0] != len(records):
+            raise ValueError(f"Got {matrix.shape[0]} embeddings for {len(records)} records")
+        if normalize:
+            matrix = normalize_rows(matrix)
+        matrix = np.ascontiguousarray(matrix, dtype=dtype)
+
+        directory = os.path.dirname(prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        digest = hashlib.sha256(matrix.tobytes())
+        schema = {}
+
+        def write_matrix(path):
+            with open(path, 'wb') as f:
+                np.save(f, matrix)
+
+        def write_chunks(path):
+            schema.update(ChunkTable.write(path, records))
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+
+        # Metadata goes last so a reader never sees a header newer than its data files
+        _atomic_write(prefix + EMBEDDINGS_SUFFIX, write_matrix)
+        _atomic_write(prefix + CHUNKS_SUFFIX, write_chunks)
+
+        header = {
+            'format_version': FORMAT_VERSION,
+            'dtype': dtype,
+            'shape': list(matrix.shape),
+            'model': model_name,
+            'normalized': normalize,
+            'data_version': digest.hexdigest()[:16],
+            'chunks': schema,
+        }
+        if before_publish is not None:
+            before_publish(cls(np.load(prefix + EMBEDDINGS_SUFFIX, mmap_mode='r', allow_pickle=False),
+                               ChunkTable.open(prefix + CHUNKS_SUFFIX, schema), header))
+
+        def write_metadata(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'header': header}, f, separators=(',', ':'))
+
+        _atomic_write(prefix + METADATA_SUFFIX, write_metadata)
+        return header
+
+    @classmethod
+    def load(cls, prefix: str, mmap_mode: Optional[str] = 'r') -> 'EmbeddingStore':
+        """Open a store; the embedding matrix and chunk columns are memory-mapped, not copied"""
+        with open(prefix + METADATA_SUFFIX, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        header = meta['header']
+        if header.get('format_version') not in READABLE_VERSIONS:
+            raise ValueError(f"Unsupported store format version {header.get('format_version')} in {prefix}")
+
+        embeddings = np.load(prefix + EMBEDDINGS_SUFFIX, mmap_mode=mmap_mode, allow_pickle=False)
+        if list(embeddings.shape) != header['shape'] or str(embeddings.dtype) != header['dtype']:
+            raise ValueError(f"Embedding matrix in {prefix} does not match its metadata header")
+
+        if header['format_version'] == 1:
+            records = meta['records']
+        else:
+            records = ChunkTable.open(prefix + CHUNKS_SUFFIX, header['chunks'])
+        return cls(embeddings, records, header)
+
+
+def convert_json_to_store(json_file: str, prefix: Optional[str] = None,
+                          dtype: str = 'float32', model_name: Optional[str] = None) -> Dict[str, Any]:
+    """Convert a legacy processed_data.json dump into the binary store format"""
+    with open(json_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    records = data['processed_data']
+    embeddings = np.asarray(data['embeddings'], dtype=np.float32)
+    return EmbeddingStore.save(prefix or store_prefix(json_file), embeddings, records,
+                               dtype=dtype, model_name=model_name)
@@ -0,0 +1,198 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, Optional
+
+DEFAULT_MAX_DIMENSION = 1024
+DEFAULT_JPEG_QUALITY = 85
+DEFAULT_CACHE_SIZE = 256
+# Formats the vision API accepts as-is
+SUPPORTED_MIME_TYPES = {'image/png', 'image/jpeg', 'image/webp', 'image/gif'}
+
+
+def sniff_mime_type(data: bytes) -> Optional[str]:
+    """Identify the real image format from its magic bytes"""
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    if data.startswith(b'BM'):
+        return 'image/bmp'
+    if data[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'image/tiff'
+    return None
+
+
+class ProcessedImage:
+    """An image ready for the vision model"""
+
+    def __init__(self, key: str, mime_type: str, data: str, width: int, height: int,
+                 original_bytes: int, encoded_bytes: int):
+        self.key = key
+        self.mime_type = mime_type
+        self.data = data
+        self.width = width
+        self.height = height
+        self.original_bytes = original_bytes
+        self.encoded_bytes = encoded_bytes
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{self.data}"
+
+
+class ImageProcessor:
+    """Downscale and re-encode uploaded images off the event loop, cached by content hash.
+
+    Images within ``max_dimension`` that are already in a supported format
+    pass through untouched; anything larger is resized (aspect preserved) and
+    re-encoded as PNG when it has transparency, JPEG otherwise; other
+    formats (BMP, TIFF) are re-encoded the same way. Results are kept in an
+    LRU keyed by the SHA-256 of the decoded bytes, so resubmitting a
+    screenshot costs one hash, and concurrent requests for the same image
+    share one decode.
+    """
+
+    def __init__(self, max_dimension: int = DEFAULT_MAX_DIMENSION, jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+                 cache_size: int = DEFAULT_CACHE_SIZE, max_workers: int = 4):
+        self.max_dimension = max_dimension
+        self.jpeg_quality = jpeg_quality
+        self.cache_size = cache_size
+        self.stats = {'hits': 0, 'misses': 0, 'bytes_in': 0, 'bytes_out': 0}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image')
+        self._cache: 'OrderedDict[str, ProcessedImage]' = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'ImageProcessor':
+        return cls(
+            max_dimension=int(os.getenv('IMAGE_MAX_DIMENSION', str(DEFAULT_MAX_DIMENSION))),
+            jpeg_quality=int(os.getenv('IMAGE_JPEG_QUALITY', str(DEFAULT_JPEG_QUALITY))),
+            cache_size=int(os.getenv('IMAGE_CACHE_SIZE', str(DEFAULT_CACHE_SIZE)))
+        )
+
+    @staticmethod
+    def decode(image_data: str) -> bytes:
+        """Accept plain base64 or a ``data:`` URL"""
+        if image_data.startswith('data:'):
+            image_data = image_data.split(',', 1)[-1]
+        try:
+            return base64.b64decode(image_data, validate=False)
+        except (binascii.Error, ValueError) as e:
+            raise ValueError(f"Image is not valid base64: {e}")
+
+    def get_cached(self, key: str) -> Optional[ProcessedImage]:
+        with self._lock:
+            image = self._cache.get(key)
+            if image is not None:
+                self._cache.move_to_end(key)
+            return image
+
+    def _remember(self, image: ProcessedImage):
+        with self._lock:
+            self._cache[image.key] = image
+            self._cache.move_to_end(image.key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def process(self, image_data: str) -> ProcessedImage:
+        """Synchronous decode/resize/re-encode with caching"""
+        raw = self.decode(image_data)
+        key = hashlib.sha256(raw).hexdigest()
+        cached = self.get_cached(key)
+        if cached is not None:
+            self.stats['hits'] += 1
+            return cached
+        self.stats['misses'] += 1
+        image = self._transform(key, raw)
+        self._remember(image)
+        return image
+
+    async def prepare(self, image_data: str) -> ProcessedImage:
+        """Process an image in the thread pool; identical concurrent uploads share one job"""
+        loop = asyncio.get_running_loop()
+        raw = await loop.run_in_executor(self._executor, self.decode, image_data)
+        key = hashlib.sha256(raw).hexdigest()
+
+        cached = self.get_cached(key)
+        if cached is not None:
+            self.stats['hits'] += 1
+            return cached
+        pending = self._pending.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Only the owner's cancellation is recoverable: redo the job here instead
+                if not pending.cancelled():
+                    raise
+            return await self.prepare(image_data)
+
+        self.stats['misses'] += 1
+        future = loop.create_future()
+        self._pending[key] = future
+        try:
+            image = await loop.run_in_executor(self._executor, self._transform, key, raw)
+            self._remember(image)
+            future.set_result(image)
+            return image
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieve it so an unawaited future does not log "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            # The owner was cancelled mid-job: release the waiters instead of leaving them hanging
+            if not future.done():
+                future.cancel()
+            del self._pending[key]
+
+    def _transform(self, key: str, raw: bytes) -> ProcessedImage:
+        from PIL import Image
+
+        sniffed = sniff_mime_type(raw)
+        try:
+            with Image.open(BytesIO(raw)) as image:
+                image.load()
+                width, height = image.size
+                needs_resize = max(width, height) > self.max_dimension
+                if not needs_resize and sniffed in SUPPORTED_MIME_TYPES:
+                    return self._result(key, sniffed, raw, width, height, len(raw))
+
+                if needs_resize:
+                    image.thumbnail((self.max_dimension, self.max_dimension), Image.LANCZOS)
+                has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+                buffer = BytesIO()
+                if has_alpha:
+                    image.save(buffer, format='PNG', optimize=True)
+                    mime_type = 'image/png'
+                else:
+                    image.convert('RGB').save(buffer, format='JPEG', quality=self.jpeg_quality, optimize=True)
+                    mime_type = 'image/jpeg'
+                encoded = buffer.getvalue()
+                width, height = image.size
+        except Exception as e:
+            raise ValueError(f"Unreadable image ({sniffed or 'unknown format'}): {e}")
+
+        return self._result(key, mime_type, encoded, width, height, len(raw))
+
+    def _result(self, key: str, mime_type: str, encoded: bytes, width: int, height: int,
+                original_bytes: int) -> ProcessedImage:
+        self.stats['bytes_in'] += original_bytes
+        self.stats['bytes_out'] += len(encoded)
+        return ProcessedImage(key, mime_type, base64.b64encode(encoded).decode('ascii'),
+                              width, height, original_bytes, len(encoded))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from embedding_store import METADATA_SUFFIX, store_prefix
+
+
+class IndexSnapshot:
+    """One loaded corpus/index version plus the number of searches currently using it"""
+
+    def __init__(self, vector_search, loaded_at: float):
+        self.vector_search = vector_search
+        self.version = vector_search.data_version or 'unversioned'
+        self.loaded_at = loaded_at
+        self.refcount = 0
+        self.retired = False
+
+
+class IndexManager:
+    """Serve searches from the current index snapshot and swap in new data without downtime.
+
+    ``acquire`` pins the current snapshot for the duration of a search.
+    ``reload`` builds a new snapshot off the request path (reusing the loaded
+    model), swaps it in atomically, and retires the old one; a retired
+    snapshot is released once its last in-flight search finishes. A watcher
+    thread can trigger reloads when the store's metadata file changes, which
+    ``EmbeddingStore.save`` writes last, after the data files and side indexes.
+    """
+
+    def __init__(self, data_file: str, build: Callable[[Optional[object]], object]):
+        self.data_file = data_file
+        self._build = build
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._current: Optional[IndexSnapshot] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._release_hooks: List[Callable[[IndexSnapshot], None]] = []
+        self.stats = {'reloads': 0, 'reload_failures': 0, 'released': 0}
+        self.last_error: Optional[str] = None
+
+    @property
+    def metadata_file(self) -> str:
+        """The file whose change signals new data: the store header, or a legacy JSON dump"""
+        path = store_prefix(self.data_file) + METADATA_SUFFIX
+        return path if os.path.exists(path) else self.data_file
+
+    @property
+    def current(self) -> Optional[IndexSnapshot]:
+        return self._current
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._current.version if self._current else None
+
+    def load(self) -> IndexSnapshot:
+        """Initial load; raises on failure so startup reports it"""
+        snapshot = IndexSnapshot(self._build(None), time.time())
+        with self._lock:
+            self._current = snapshot
+        return snapshot
+
+    @contextmanager
+    def acquire(self):
+        """Pin the current snapshot so a concurrent swap cannot release it mid-search"""
+        with self._lock:
+            snapshot = self._current
+            if snapshot is None:
+                raise RuntimeError("Index is not loaded")
+            snapshot.refcount += 1
+        try:
+            yield snapshot
+        finally:
+            with self._lock:
+                snapshot.refcount -= 1
+                release = snapshot.retired and snapshot.refcount == 0
+            if release:
+                self._release(snapshot)
+
+    def reload(self, force: bool = False) -> Dict:
+        """Load the store again and swap it in if its data version changed (or ``force``)"""
+        with self._reload_lock:
+            previous = self._current
+            try:
+                vector_search = self._build(previous.vector_search.model if previous else None)
+            except Exception as e:
+                self.stats['reload_failures'] += 1
+                self.last_error = str(e)
+                print(f"Index reload failed, still serving {self.version}: {e}")
+                return {'swapped': False, 'version': self.version, 'error': str(e)}
+
+            snapshot = IndexSnapshot(vector_search, time.time())
+            if previous is not None and snapshot.version == previous.version and not force:
+                return {'swapped': False, 'version': previous.version}
+
+            with self._lock:
+                self._current = snapshot
+                if previous is not None:
+                    previous.retired = True
+                    release = previous.refcount == 0
+                else:
+                    release = False
+            if release:
+                self._release(previous)
+            self.stats['reloads'] += 1
+            self.last_error = None
+            print(f"Index swapped: {previous.version if previous else None} -> {snapshot.version}")
+            return {'swapped': True, 'version': snapshot.version,
+                    'previous_version': previous.version if previous else None}
+
+    def add_release_hook(self, hook: Callable[[IndexSnapshot], None]):
+        """Call ``hook`` when a retired snapshot is released and its version is no longer current"""
+        self._release_hooks.append(hook)
+
+    def _release(self, snapshot: IndexSnapshot):
+        # Dropping the last references lets the memory maps of the old store close
+        snapshot.vector_search = None
+        self.stats['released'] += 1
+        if self._current is not None and self._current.version == snapshot.version:
+            return
+        for hook in self._release_hooks:
+            try:
+                hook(snapshot)
+            except Exception as e:
+                print(f"Index release hook failed for {snapshot.version}: {e}")
+
+    def start_watcher(self, interval: float):
+        """Poll the metadata file and reload once it has changed and stopped changing"""
+        if self._watcher is not None or interval <= 0:
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name='index-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def _watch(self, interval: float):
+        seen = _mtime(self.metadata_file)
+        pending = None
+        while not self._stop.wait(interval):
+            mtime = _mtime(self.metadata_file)
+            if mtime is None or mtime == seen:
+                pending = None
+                continue
+            if mtime != pending:
+                # Wait one more interval so a writer that is still mid-save settles first
+                pending = mtime
+                continue
+            seen = mtime
+            pending = None
+            self.reload()
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ann_index import top_k_desc
+
+LEXICAL_SUFFIX = '.bm25.bin'
+LEXICAL_FORMAT_VERSION = 1
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Terms in more than this share of chunks are skipped when a query has rarer terms
+COMMON_TERM_RATIO = 0.25
+ALIGNMENT = 8
+_MAGIC = b'BM25IDX1'
+
+# Identifiers such as "gpt-4o-mini", "ga5" or "numpy.linalg" stay whole; their parts are indexed too
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+(?:[._\-][a-z0-9]+)*')
+_PART_PATTERN = re.compile(r'[._\-]')
+STOPWORDS = frozenset(
+    'a an and are as at be but by can do does for from has have how i if in into is it its me my no not '
+    'of on or so that the their then there these they this to was we were what when where which who why '
+    'will with you your'.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word and identifier tokens, with compound identifiers also split into parts"""
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in _PART_PATTERN.split(token) if part and part not in STOPWORDS)
+    return tokens
+
+
+def term_hash(term: str) -> int:
+    """Stable 64-bit term id; the index stores hashes instead of a string vocabulary"""
+    return int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _document_text(record: Dict) -> str:
+    return f"{record.get('title') or ''}\n{record.get('content') or ''}"
+
+
+class LexicalIndex:
+    """BM25 inverted index stored as flat arrays in one memory-mapped file.
+
+    Terms are sorted 64-bit hashes, so a lookup is a binary search with no
+    vocabulary to load. Each term's postings are a slice of row ids plus
+    precomputed BM25 weights (idf and length normalisation folded in at build
+    time), so scoring a query is a concatenate and a grouped sum over the
+    postings of its terms only.
+    """
+
+    def __init__(self, term_hashes: np.ndarray, offsets: np.ndarray, doc_ids: np.ndarray,
+                 weights: np.ndarray, n_rows: int, data_version: str = ''):
+        self.term_hashes = term_hashes
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.n_rows = n_rows
+        self.data_version = data_version
+
+    @property
+    def n_terms(self) -> int:
+        return len(self.term_hashes)
+
+    @classmethod
+    def build(cls, records: Iterable[Dict], data_version: str = '', k1: float = BM25_K1,
+              b: float = BM25_B) -> 'LexicalIndex':
+        vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        term_freqs: List[int] = []
+        lengths: List[int] = []
+        for row, record in enumerate(records):
+            tokens = tokenize(_document_text(record))
+            lengths.append(len(tokens))
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+                doc_ids.append(row)
+                term_freqs.append(count)
+
+        n_rows = len(lengths)
+        if not vocabulary:
+            return cls(np.empty(0, dtype=np.uint64), np.zeros(1, dtype=np.int64),
+                       np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32), n_rows, data_version)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        tf = np.asarray(term_freqs, dtype=np.float32)
+        lengths = np.asarray(lengths, dtype=np.float32)
+
+        hashes = np.fromiter((term_hash(term) for term in vocabulary), dtype=np.uint64, count=len(vocabulary))
+        # Order terms by hash, and each term's postings by row (already increasing within a term)
+        rank = np.empty(len(hashes), dtype=np.int64)
+        rank[np.argsort(hashes, kind='stable')] = np.arange(len(hashes))
+        order = np.argsort(rank[term_ids], kind='stable')
+        term_ids = rank[term_ids][order]
+        doc_ids = doc_ids[order]
+        tf = tf[order]
+
+        df = np.bincount(term_ids, minlength=len(hashes))
+        offsets = np.zeros(len(hashes) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+        idf = np.log1p((n_rows - df + 0.5) / (df + 0.5)).astype(np.float32)
+        average_length = max(float(lengths.mean()), 1.0)
+        norm = k1 * (1.0 - b + b * lengths[doc_ids] / average_length)
+        weights = (idf[term_ids] * tf * (k1 + 1.0) / (tf + norm)).astype(np.float32)
+        return cls(np.sort(hashes), offsets, doc_ids, weights, n_rows, data_version)
+
+    def _postings(self, query: str, rows: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        hashes = np.array(sorted({term_hash(term) for term in tokenize(query)}), dtype=np.uint64)
+        if len(hashes) == 0 or self.n_terms == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        positions = np.minimum(np.searchsorted(self.term_hashes, hashes), self.n_terms - 1)
+        positions = positions[self.term_hashes[positions] == hashes]
+        if len(positions) == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        sizes = self.offsets[positions + 1] - self.offsets[positions]
+        rare = sizes <= COMMON_TERM_RATIO * self.n_rows
+        if rare.any():
+            positions = positions[rare]
+        ids = np.concatenate([self.doc_ids[self.offsets[p]:self.offsets[p + 1]] for p in positions])
+        weights = np.concatenate([self.weights[self.offsets[p]:self.offsets[p + 1]] for p in positions])
+        if rows is not None:
+            if len(rows) == 0:
+                return ids[:0], weights[:0]
+            found = np.minimum(np.searchsorted(rows, ids), len(rows) - 1)
+            keep = rows[found] == ids
+            ids, weights = ids[keep], weights[keep]
+        return ids, weights
+
+    def search(self, queries: List[str], top_k: int,
+               rows: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Return (row ids, BM25 scores) per query, best first, optionally only over ``rows``"""
+        results = []
+        for query in queries:
+            ids, weights = self._postings(query, rows)
+            if len(ids) == 0:
+                results.append((np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)))
+                continue
+            unique_ids, inverse = np.unique(ids, return_inverse=True)
+            scores = np.bincount(inverse, weights=weights).astype(np.float32)
+            best = top_k_desc(scores, top_k)
+            results.append((unique_ids[best].astype(np.int64), scores[best]))
+        return results
+
+    def save(self, prefix: str):
+        """Write the header and arrays into one file, each array aligned for zero-copy mapping"""
+        arrays = {'term_hashes': self.term_hashes, 'offsets': self.offsets,
+                  'doc_ids': self.doc_ids, 'weights': self.weights}
+        header = {'format_version': LEXICAL_FORMAT_VERSION, 'n_rows': self.n_rows,
+                  'data_version': self.data_version, 'arrays': {}}
+        # Array offsets are relative to the aligned end of the header, so the header can record them
+        position = 0
+        for name, array in arrays.items():
+            position += (-position) % ALIGNMENT
+            header['arrays'][name] = [position, array.dtype.str, len(array)]
+            position += array.nbytes
+        header_bytes = json.dumps(header).encode('utf-8')
+        data_start = len(_MAGIC) + 8 + len(header_bytes)
+        data_start += (-data_start) % ALIGNMENT
+
+        tmp_path = f"{prefix}{LEXICAL_SUFFIX}.tmp-{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(_MAGIC)
+            f.write(len(header_bytes).to_bytes(8, 'little'))
+            f.write(header_bytes)
+            for name, array in arrays.items():
+                f.write(b'\0' * (data_start + header['arrays'][name][0] - f.tell()))
+                f.write(np.ascontiguousarray(array).tobytes())
+        os.replace(tmp_path, prefix + LEXICAL_SUFFIX)
+
+    @staticmethod
+    def exists(prefix: str) -> bool:
+        return os.path.exists(prefix + LEXICAL_SUFFIX)
+
+    @classmethod
+    def load(cls, prefix: str) -> 'LexicalIndex':
+        """Memory-map a file written by ``save``; pages are read only for the terms queried"""
+        path = prefix + LEXICAL_SUFFIX
+        with open(path, 'rb') as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} is not a lexical index")
+            header_length = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(header_length).decode('utf-8'))
+        if header['format_version'] != LEXICAL_FORMAT_VERSION:
+            raise ValueError(f"Unsupported lexical index format {header['format_version']}")
+
+        data_start = len(_MAGIC) + 8 + header_length
+        data_start += (-data_start) % ALIGNMENT
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        arrays = {}
+        for name, (offset, dtype, count) in header['arrays'].items():
+            arrays[name] = np.frombuffer(buffer, dtype=np.dtype(dtype), count=count, offset=data_start + offset)
+        return cls(arrays['term_hashes'], arrays['offsets'], arrays['doc_ids'], arrays['weights'],
+                   header['n_rows'], header['data_version'])
+
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], top_k: int,
+                           k: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (row ids, fused scores), best first, scoring each row by the sum of 1 / (k + rank) over the rankings"""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking.tolist()):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank + 1)
+    ordered = sorted(fused, key=lambda row: (-fused[row], row))[:top_k]
+    return np.array(ordered, dtype=np.int64), np.array([fused[row] for row in ordered], dtype=np.float64)
+
@@ -1,64 +1,255 @@
-import openai
+import asyncio
 import os
-from typing import List, Dict, Optional
-import base64
-from io import BytesIO
-from PIL import Image
+import random
+from typing import List, Dict, Optional, AsyncIterator
+import time
 
-class LLMClient:
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-    
-    def generate_answer(self, question: str, context: List[Dict], image_data: Optional[str] = None) -> str:
-        """Generate answer using LLM with context"""
-        
-        # Prepare context text
-        context_text = "\n\n".join([
-            f"Source: {item['title']}\nURL: {item['url']}\nContent: {item['content'][:1000]}..."
-            for item in context[:5]  # Use top 5 most relevant contexts
-        ])
-        
-        system_prompt = """You are a helpful teaching assistant for the Tools in Data Science course at IIT Madras. 
+import metrics
+from context_packer import ContextPacker, default_packer
+from image_processor import ImageProcessor, ProcessedImage
+
+SYSTEM_PROMPT = """You are a helpful teaching assistant for the Tools in Data Science course at IIT Madras. 
         You have access to course content and discourse forum discussions. 
         
         Answer student questions based on the provided context. Be specific and helpful.
         If you don't know something or the information isn't in the context, say so clearly.
         
         When referencing specific information, mention which source it comes from."""
-        
-        user_prompt = f"""Question: {question}
+
+TEXT_MODEL = "gpt-3.5-turbo"
+VISION_MODEL = "gpt-4-vision-preview"
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+ERROR_ANSWER_PREFIX = "I apologize, but I'm unable to process your question right now."
+
+
+def build_messages(question: str, context: List[Dict], image: Optional[ProcessedImage] = None,
+                   packer: Optional[ContextPacker] = None) -> List[Dict]:
+    """Build the chat messages for a question, its retrieved context and an optional image"""
+
+    # Deduplicated, merged context filling a token budget in relevance order
+    packed = (packer or default_packer()).pack(context)
+    context_text = packed['text']
+    metrics.CONTEXT_TOKENS.inc(packed['tokens'], kind='packed')
+    metrics.CONTEXT_TOKENS.inc(packed['legacy_tokens'], kind='legacy')
+
+    user_prompt = f"""Question: {question}
         
         Context:
         {context_text}
         
         Please provide a helpful answer based on the context above."""
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+    # Add the preprocessed image (for GPT-4 Vision), labelled with its real format
+    if image is not None:
+        messages[-1]["content"] = [
+            {"type": "text", "text": user_prompt},
+            {"type": "image_url", "image_url": {"url": image.data_url}}
         ]
-        
-        # Add image if provided
+
+    return messages
+
+
+def completion_params(question: str, context: List[Dict], image: Optional[ProcessedImage] = None) -> Dict:
+    return {
+        "model": TEXT_MODEL if image is None else VISION_MODEL,
+        "messages": build_messages(question, context, image),
+        "max_tokens": 1000,
+        "temperature": 0.3
+    }
+
+
+def error_answer(error: Exception) -> str:
+    return f"{ERROR_ANSWER_PREFIX} Error: {str(error)}"
+
+
+def is_error_answer(answer: str) -> bool:
+    """True if the LLM call failed, including mid-stream failures (never worth caching)"""
+    return ERROR_ANSWER_PREFIX in answer
+
+
+class LLMClient:
+    def __init__(self):
+        import openai
+        self.client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.images = ImageProcessor.from_env()
+
+    def generate_answer(self, question: str, context: List[Dict], image_data: Optional[str] = None) -> str:
+        """Generate answer using LLM with context"""
+        image = None
         if image_data:
             try:
-                # Decode base64 image
-                image_bytes = base64.b64decode(image_data)
-                # Add image to message (for GPT-4 Vision)
-                messages[-1]["content"] = [
-                    {"type": "text", "text": user_prompt},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_data}"}}
-                ]
-            except Exception as e:
+                image = self.images.process(image_data)
+            except ValueError as e:
                 print(f"Error processing image: {e}")
-        
         try:
             response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo" if not image_data else "gpt-4-vision-preview",
-                messages=messages,
-                max_tokens=1000,
-                temperature=0.3
+                **completion_params(question, context, image)
             )
-            
+
+            return response.choices[0].message.content
+        except Exception as e:
+            return error_answer(e)
+
+
+class AsyncLLMClient:
+    """Non-blocking LLM client sharing one pooled HTTP connection pool across requests.
+
+    Each call gets an overall deadline, calls are capped at ``max_concurrency``
+    in flight, and 429/5xx/connection errors are retried with jittered
+    exponential backoff (honouring ``Retry-After``) while the deadline allows.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 timeout: float = 30.0, max_concurrency: int = 32, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0):
+        # Imported here so importing this module stays cheap on cold start
+        import httpx
+        import openai
+
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            timeout=httpx.Timeout(timeout, connect=min(timeout, 5.0))
+        )
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key or os.getenv('OPENAI_API_KEY'),
+            base_url=base_url or os.getenv('OPENAI_BASE_URL'),
+            http_client=self._http_client,
+            max_retries=0  # retries are handled here so they respect the per-request deadline
+        )
+        self.images = ImageProcessor.from_env()
+
+    @classmethod
+    def from_env(cls) -> 'AsyncLLMClient':
+        return cls(
+            timeout=float(os.getenv('LLM_TIMEOUT', '30')),
+            max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '32')),
+            max_retries=int(os.getenv('LLM_MAX_RETRIES', '3'))
+        )
+
+    async def generate_answer(self, question: str, context: List[Dict], image_data: Optional[str] = None) -> str:
+        """Generate answer using LLM with context without blocking the event loop"""
+        try:
+            image = await self.prepare_image(image_data)
+            with metrics.stage('prompt_build'):
+                params = completion_params(question, context, image)
+            with metrics.stage('llm'):
+                response = await self.complete(**params)
+            metrics.record_usage(params['model'], getattr(response, 'usage', None))
             return response.choices[0].message.content
         except Exception as e:
-            return f"I apologize, but I'm unable to process your question right now. Error: {str(e)}"
\ No newline at end of file
+            return error_answer(e)
+
+    async def stream_answer(self, question: str, context: List[Dict],
+                            image_data: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield answer text deltas as the model produces them.
+
+        Retries only apply until the stream is opened; once tokens have been
+        sent a failure ends the stream with the error message appended. The
+        stream holds its concurrency slot until it is fully read or closed.
+        """
+        try:
+            image = await self.prepare_image(image_data)
+            with metrics.stage('prompt_build'):
+                params = completion_params(question, context, image)
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.timeout
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            stream = None
+            try:
+                start = time.perf_counter()
+                first_token = True
+                with metrics.stage('llm'):
+                    # include_usage adds a final chunk with token counts and no choices
+                    stream = await self.complete(stream=True, stream_options={"include_usage": True},
+                                                 deadline=deadline, limited=False, **params)
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            if first_token:
+                                metrics.STAGE_SECONDS.observe(time.perf_counter() - start, stage='llm_first_token')
+                                first_token = False
+                            yield chunk.choices[0].delta.content
+                        metrics.record_usage(params['model'], getattr(chunk, 'usage', None))
+            finally:
+                # A consumer that stops early must not leave the HTTP response (and its pooled connection) open
+                try:
+                    if stream is not None:
+                        await stream.close()
+                finally:
+                    self._semaphore.release()
+        except Exception as e:
+            yield error_answer(e)
+
+    async def prepare_image(self, image_data: Optional[str]) -> Optional[ProcessedImage]:
+        """Downscale/re-encode an uploaded image in the thread pool; unreadable images are dropped"""
+        if not image_data:
+            return None
+        try:
+            with metrics.stage('image_preprocess'):
+                return await self.images.prepare(image_data)
+        except ValueError as e:
+            print(f"Error processing image: {e}")
+            return None
+
+    async def complete(self, deadline: Optional[float] = None, limited: bool = True, **params):
+        """Run one chat completion under the deadline, concurrency limit and retry policy.
+
+        Callers that already hold a concurrency slot pass ``limited=False``
+        and their own loop-time ``deadline``.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = deadline if deadline is not None else loop.time() + self.timeout
+        attempt = 0
+
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError(f"LLM request exceeded {self.timeout}s deadline")
+            try:
+                # Time spent queueing for a concurrency slot counts against the deadline too
+                return await asyncio.wait_for(self._attempt(params, limited), remaining)
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    raise
+                delay = self._backoff_delay(e, attempt)
+                if loop.time() + delay >= deadline:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def _attempt(self, params: Dict, limited: bool = True):
+        if not limited:
+            return await self.client.chat.completions.create(**params)
+        async with self._semaphore:
+            return await self.client.chat.completions.create(**params)
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        import openai
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in RETRYABLE_STATUS_CODES
+        return isinstance(error, openai.APIConnectionError)
+
+    def _backoff_delay(self, error: Exception, attempt: int) -> float:
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def aclose(self):
+        await self._http_client.aclose()
+        self.images.close()
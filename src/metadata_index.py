@@ -0,0 +1,209 @@
+import json
+import os
+from datetime import date, datetime, time, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from chunk_table import ChunkTable
+
+FILTERS_SUFFIX = '.filters.npz'
+# Fields with an exact-match posting list per distinct value (lists such as tags index every element)
+POSTING_FIELDS = ('source', 'file', 'topic_id', 'tags', 'is_accepted_answer')
+# Fields with rows sorted by value, for range filters
+RANGE_FIELDS = ('created_at', 'like_count')
+
+
+def parse_timestamp(value, end_of_day: bool = False) -> Optional[float]:
+    """Epoch seconds from an ISO date/datetime string (naive values are UTC).
+
+    With ``end_of_day`` a date without a time means its last instant rather
+    than midnight, so an inclusive upper bound covers the whole day.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if end_of_day:
+        try:
+            day = date.fromisoformat(str(value))
+        except ValueError:
+            day = None  # has a time part
+        if day is not None:
+            return datetime.combine(day, time.max, tzinfo=timezone.utc).timestamp()
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _field_values(records, name: str) -> Optional[List[Any]]:
+    """Python values of one field (None where missing), or None if no record has it"""
+    if isinstance(records, ChunkTable):
+        if name not in records.names:
+            return None
+        kind = records.kind(name)
+        if kind in ('int', 'float', 'bool'):
+            valid = records.valid(name)
+            return [value if ok else None for value, ok in zip(records.values(name).tolist(), valid)]
+        if kind == 'cat':
+            categories = records.categories(name)
+            valid = records.valid(name)
+            return [categories[code] if ok else None for code, ok in zip(records.values(name).tolist(), valid)]
+        return records.strings(name)
+    values = [record.get(name) for record in records]
+    return values if any(value is not None for value in values) else None
+
+
+class MetadataIndex:
+    """Posting lists and sorted range indexes over chunk metadata, for filtered search.
+
+    ``select`` turns a filter dict into the sorted row ids that match every
+    condition, intersecting the smallest candidate sets first, so the vector
+    index only has to score that subset.
+    """
+
+    def __init__(self, n_rows: int, postings: Dict[str, Tuple[List[str], np.ndarray, np.ndarray]],
+                 ranges: Dict[str, Tuple[np.ndarray, np.ndarray]], data_version: str = ''):
+        self.n_rows = n_rows
+        self.postings = postings
+        self.ranges = ranges
+        self.data_version = data_version
+        self._key_positions = {field: {key: i for i, key in enumerate(keys)}
+                               for field, (keys, _, _) in postings.items()}
+
+    @classmethod
+    def build(cls, records, data_version: str = '') -> 'MetadataIndex':
+        n_rows = len(records)
+        postings, ranges = {}, {}
+
+        for field in POSTING_FIELDS:
+            values = _field_values(records, field)
+            if values is None:
+                continue
+            lists: Dict[str, List[int]] = {}
+            for row, value in enumerate(values):
+                for item in (value if isinstance(value, list) else [value]):
+                    if item is not None:
+                        lists.setdefault(_key(item), []).append(row)
+            keys = sorted(lists)
+            counts = [len(lists[key]) for key in keys]
+            offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+            np.cumsum(counts, out=offsets[1:])
+            ids = np.fromiter((row for key in keys for row in lists[key]), dtype=np.int64, count=int(offsets[-1]))
+            postings[field] = (keys, offsets, ids)
+
+        for field in RANGE_FIELDS:
+            values = _field_values(records, field)
+            if values is None:
+                continue
+            convert = parse_timestamp if field == 'created_at' else float
+            pairs = []
+            for row, value in enumerate(values):
+                try:
+                    number = convert(value) if value is not None else None
+                except (TypeError, ValueError):
+                    number = None
+                if number is not None:
+                    pairs.append((number, row))
+            pairs.sort()
+            ranges[field] = (np.array([p[0] for p in pairs], dtype=np.float64),
+                             np.array([p[1] for p in pairs], dtype=np.int64))
+
+        return cls(n_rows, postings, ranges, data_version)
+
+    def _posting(self, field: str, values) -> np.ndarray:
+        if field not in self.postings:
+            return np.empty(0, dtype=np.int64)
+        _, offsets, ids = self.postings[field]
+        positions = self._key_positions[field]
+        parts = []
+        for value in (values if isinstance(values, (list, tuple, set)) else [values]):
+            position = positions.get(_key(value))
+            if position is not None:
+                parts.append(ids[offsets[position]:offsets[position + 1]])
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+
+    def _range(self, field: str, low: Optional[float], high: Optional[float]) -> np.ndarray:
+        if field not in self.ranges:
+            return np.empty(0, dtype=np.int64)
+        values, ids = self.ranges[field]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        end = len(values) if high is None else np.searchsorted(values, high, side='right')
+        return np.sort(ids[start:end])
+
+    def select(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Sorted ids of rows matching every filter, or None when nothing is filtered.
+
+        Supported keys: ``source``, ``file``, ``topic_id``, ``tags`` (each a
+        value or list of values, any of which may match), ``accepted_only``,
+        ``created_after``/``created_before`` (ISO dates, inclusive; a bare
+        ``created_before`` date covers that whole day) and ``min_likes``.
+        """
+        if not filters:
+            return None
+        candidates = []
+        for name, value in filters.items():
+            if value is None:
+                continue
+            if name in ('source', 'file', 'topic_id', 'tags'):
+                candidates.append(self._posting(name, value))
+            elif name == 'accepted_only':
+                if value:
+                    candidates.append(self._posting('is_accepted_answer', True))
+            elif name in ('created_after', 'created_before'):
+                bound = parse_timestamp(value, end_of_day=name == 'created_before')
+                candidates.append(self._range('created_at', bound if name == 'created_after' else None,
+                                              bound if name == 'created_before' else None))
+            elif name == 'min_likes':
+                candidates.append(self._range('like_count', float(value), None))
+            else:
+                raise ValueError(f"Unknown search filter {name!r}")
+        if not candidates:
+            return None
+
+        candidates.sort(key=len)
+        rows = candidates[0]
+        for other in candidates[1:]:
+            if len(rows) == 0:
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def save(self, prefix: str):
+        header = {'n_rows': self.n_rows, 'data_version': self.data_version,
+                  'postings': {field: keys for field, (keys, _, _) in self.postings.items()},
+                  'ranges': list(self.ranges)}
+        arrays = {'header': np.array(json.dumps(header))}
+        for field, (_, offsets, ids) in self.postings.items():
+            arrays[f'posting_offsets_{field}'] = offsets
+            arrays[f'posting_ids_{field}'] = ids
+        for field, (values, ids) in self.ranges.items():
+            arrays[f'range_values_{field}'] = values
+            arrays[f'range_ids_{field}'] = ids
+        tmp_path = f"{prefix}{FILTERS_SUFFIX}.tmp-{os.getpid()}.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, prefix + FILTERS_SUFFIX)
+
+    @staticmethod
+    def exists(prefix: str) -> bool:
+        return os.path.exists(prefix + FILTERS_SUFFIX)
+
+    @classmethod
+    def load(cls, prefix: str) -> 'MetadataIndex':
+        with np.load(prefix + FILTERS_SUFFIX, allow_pickle=False) as data:
+            header = json.loads(str(data['header']))
+            postings = {field: (keys, data[f'posting_offsets_{field}'], data[f'posting_ids_{field}'])
+                        for field, keys in header['postings'].items()}
+            ranges = {field: (data[f'range_values_{field}'], data[f'range_ids_{field}'])
+                      for field in header['ranges']}
+        return cls(header['n_rows'], postings, ranges, header['data_version'])
+
+
+def _key(value) -> str:
+    """Posting keys are strings so ints, bools and strings from JSON filters compare alike"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
@@ -0,0 +1,266 @@
+import contextvars
+import sys
+import threading
+import time
+import traceback
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Latency buckets in seconds, from sub-millisecond vector search up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_text(labelnames: Tuple[str, ...], labelvalues: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels.get(name, '')) for name in self.labelnames), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels (Prometheus semantics)"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts (non-cumulative, +Inf last), sum, count]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            index = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    index = i
+                    break
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                    lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    """Holds metrics plus callbacks for values owned elsewhere (e.g. cache stats)"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors: List[Callable[[], Iterator[str]]] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterator[str]]):
+        """Register a callable yielding exposition lines at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                lines.append(f"# collector error: {_escape(e)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'rag_stage_seconds', 'Time spent in each stage of answering a question', ('stage',))
+REQUEST_SECONDS = REGISTRY.histogram(
+    'rag_request_seconds', 'End-to-end HTTP request latency', ('path', 'status'))
+LLM_TOKENS = REGISTRY.counter(
+    'rag_llm_tokens_total', 'Tokens reported by the LLM API', ('model', 'kind'))
+CONTEXT_TOKENS = REGISTRY.counter(
+    'rag_context_tokens_total', 'Context prompt tokens sent, and what the legacy top-5 prompt would have used',
+    ('kind',))
+ERRORS = REGISTRY.counter(
+    'rag_errors_total', 'Errors by where they happened and exception type', ('stage', 'type'))
+
+_current_timer: contextvars.ContextVar = contextvars.ContextVar('request_timer', default=None)
+
+
+class RequestTimer:
+    """Per-request stage durations, rendered as a ``Server-Timing`` header"""
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+
+    def add(self, name: str, seconds: float):
+        self.stages.append((name, seconds))
+
+    def server_timing(self) -> str:
+        """One entry per stage name; repeated stages (e.g. per batch item) are summed with a count"""
+        totals: Dict[str, List[float]] = {}
+        for name, seconds in self.stages:
+            entry = totals.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+        return ', '.join(f"{name};dur={seconds * 1000:.2f}" + (f';desc="x{count}"' if count > 1 else '')
+                         for name, (seconds, count) in totals.items())
+
+
+def start_request() -> RequestTimer:
+    """Create the timer that ``stage`` records into for the current request context"""
+    timer = RequestTimer()
+    _current_timer.set(timer)
+    return timer
+
+
+@contextmanager
+def stage(name: str, timer: Optional[RequestTimer] = None):
+    """Time a block into the stage histogram and the current request's Server-Timing.
+
+    Pass ``timer`` explicitly from code running in a worker thread, where the
+    request context may not have been propagated.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_error(name, e)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timer = timer or _current_timer.get()
+        if timer is not None:
+            timer.add(name, elapsed)
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return _current_timer.get()
+
+
+def record_error(stage_name: str, error: BaseException):
+    """Count an error once, under the innermost stage that saw it; outer handlers re-raising it are no-ops"""
+    if getattr(error, '_rag_error_recorded', False):
+        return
+    try:
+        error._rag_error_recorded = True
+    except AttributeError:
+        pass
+    ERRORS.inc(stage=stage_name, type=type(error).__name__)
+
+
+def record_usage(model: str, usage):
+    """Count prompt/completion tokens from an OpenAI ``usage`` object, if present"""
+    if usage is None:
+        return
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        value = getattr(usage, kind, None)
+        if value:
+            LLM_TOKENS.inc(value, model=model, kind=kind.replace('_tokens', ''))
+
+
+class StackSampler:
+    """Wall-clock sampling profiler for hot-path investigation.
+
+    A background thread snapshots every other thread's stack each
+    ``interval`` seconds and counts collapsed stacks, which can be fed
+    straight into flamegraph tools. Only runs while explicitly started.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: StackCounter = StackCounter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frames = traceback.extract_stack(frame, limit=self.max_depth)
+                self.samples[';'.join(f"{f.name} ({f.filename}:{f.lineno})" for f in frames)] += 1
+
+    def collapsed(self) -> str:
+        """Samples in collapsed-stack format (``frame;frame;frame count``)"""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.samples.most_common()) + '\n'
+
+
+def profile_for(seconds: float, interval: float = 0.005) -> str:
+    """Sample all threads for ``seconds`` and return collapsed stacks"""
+    sampler = StackSampler(interval)
+    sampler.start()
+    try:
+        time.sleep(seconds)
+    finally:
+        sampler.stop()
+    return sampler.collapsed()
@@ -1,11 +1,17 @@
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Any
+import json
 import re
 
 class ResponseFormatter:
     def format_response(self, answer: str, search_results: List[Tuple[Dict, float]]) -> Dict:
         """Format the API response according to required schema"""
-        
-        # Extract unique links from search results
+        return {
+            "answer": answer,
+            "links": self.format_links(search_results)
+        }
+
+    def format_links(self, search_results: List[Tuple[Dict, float]]) -> List[Dict]:
+        """Extract unique links from search results"""
         links = []
         seen_urls = set()
         
@@ -29,7 +35,9 @@ class ResponseFormatter:
                     "text": text or "Relevant discussion"
                 })
         
-        return {
-            "answer": answer,
-            "links": links
-        }
\ No newline at end of file
+        return links
+
+    @staticmethod
+    def format_event(event: str, data: Any) -> str:
+        """Encode one Server-Sent Event"""
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
\ No newline at end of file
@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'processed_data.json')
+
+
+class ServiceState:
+    """Lazily initialised API components plus a per-phase startup profile.
+
+    Nothing heavy is imported until ``initialize`` runs, either in a
+    background thread at startup or on the first request that needs it.
+    Concurrent callers block on the same initialisation instead of racing.
+    """
+
+    def __init__(self, data_file: str = DATA_FILE, model=None):
+        self.data_file = data_file
+        self.model = model
+        self.index = None
+        self.llm_client = None
+        self.formatter = None
+        self.answer_cache = None
+        self.error: Optional[str] = None
+        self.profile: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def vector_search(self):
+        """The currently served VectorSearch (pin it with ``index.acquire()`` while searching)"""
+        return self.index.current.vector_search if self.index is not None and self.index.current else None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def status(self) -> str:
+        if self.ready:
+            return 'ready'
+        if self.error:
+            return 'failed'
+        if self._lock.locked():
+            return 'initializing'
+        return 'not_started'
+
+    def start_background(self):
+        """Kick off initialisation without blocking the caller"""
+        if self._thread is None and not self.ready:
+            self._thread = threading.Thread(target=self.initialize, name='service-init', daemon=True)
+            self._thread.start()
+
+    def initialize(self, retry: bool = False) -> bool:
+        """Initialise every component once; returns whether the service is ready"""
+        with self._lock:
+            if self.ready or (self.error and not retry):
+                return self.ready
+            self.error = None
+            self.profile = {}
+            try:
+                self._initialize()
+            except Exception as e:
+                self.error = str(e)
+                print(f"Initialization error: {e}")
+            return self.ready
+
+    @contextmanager
+    def _phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.profile[name] = round(time.perf_counter() - start, 4)
+
+    def _initialize(self):
+        start = time.perf_counter()
+
+        with self._phase('imports'):
+            from vector_search import VectorSearch
+            from index_manager import IndexManager
+            from llm_client import AsyncLLMClient
+            from answer_cache import AnswerCache
+            from response_formatter import ResponseFormatter
+
+        nprobe = os.getenv('IVF_NPROBE')
+
+        def build(model):
+            # Reloads reuse the loaded model; only the corpus and index are read again
+            return VectorSearch(
+                self.data_file,
+                index_mode=os.getenv('INDEX_MODE', 'exact'),
+                nprobe=int(nprobe) if nprobe else None,
+                model=model or self.model,
+                retrieval=os.getenv('RETRIEVAL_MODE', 'dense')
+            )
+
+        index = IndexManager(self.data_file, build)
+        vector_search = index.load().vector_search
+        for phase, seconds in vector_search.timings.items():
+            self.profile[phase] = round(seconds, 4)
+
+        with self._phase('llm_client'):
+            llm_client = AsyncLLMClient.from_env()
+            formatter = ResponseFormatter()
+
+        # The answer cache is optional; a failure here must not take the API down
+        answer_cache = None
+        if os.getenv('ANSWER_CACHE', '1') != '0':
+            with self._phase('answer_cache'):
+                try:
+                    answer_cache = AnswerCache.from_env(index.version)
+                    # Answers for a version are dropped once no snapshot of that version is serving
+                    index.add_release_hook(lambda snapshot: answer_cache.evict_version(snapshot.version))
+                except Exception as e:
+                    print(f"Answer cache disabled: {e}")
+
+        # The first encode pays for lazy model/runtime setup; do it before serving traffic
+        with self._phase('warmup'):
+            vector_search.encode(["warm up"])
+
+        self.index = index
+        self.llm_client = llm_client
+        self.formatter = formatter
+        self.answer_cache = answer_cache
+        self.profile['total'] = round(time.perf_counter() - start, 4)
+        print(f"Service ready: {self.profile}")
+        self._ready.set()
+        index.start_watcher(float(os.getenv('INDEX_WATCH_INTERVAL', '30')))
@@ -1,33 +1,173 @@
 import json
+import os
+import time
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional, Any
+from embedding_store import EmbeddingStore, normalize_rows, store_prefix
+from ann_index import ExactIndex, IVFIndex
+from metadata_index import MetadataIndex
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+MIN_SIMILARITY = 0.1
+INDEX_MODES = ('exact', 'approximate')
+RETRIEVAL_MODES = ('dense', 'hybrid')
+# Candidates taken from each retriever before rank fusion
+HYBRID_CANDIDATES = 50
+RRF_K = 60
 
 class VectorSearch:
-    def __init__(self, processed_data_file: str):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+    def __init__(self, processed_data_file: str, index_mode: str = 'exact', nprobe: Optional[int] = None,
+                 model=None, retrieval: str = 'dense'):
+        if index_mode not in INDEX_MODES:
+            raise ValueError(f"Unknown index mode {index_mode!r}, expected one of {INDEX_MODES}")
+        if retrieval not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {retrieval!r}, expected one of {RETRIEVAL_MODES}")
+        self.index_mode = index_mode
+        self.retrieval = retrieval
+        self.nprobe = nprobe
+        self.timings: Dict[str, float] = {}
+
+        start = time.perf_counter()
+        if model is None:
+            # Deferred: importing sentence-transformers pulls in torch, the slowest part of cold start
+            from sentence_transformers import SentenceTransformer
+            self.timings['model_import'] = time.perf_counter() - start
+            model = SentenceTransformer(MODEL_NAME)
+        self.model = model
+        self.timings['model_load'] = time.perf_counter() - start - self.timings.get('model_import', 0.0)
+
+        start = time.perf_counter()
         self.load_data(processed_data_file)
-    
+        self.timings['index_load'] = time.perf_counter() - start
+
     def load_data(self, processed_data_file: str):
-        """Load processed data and embeddings"""
+        """Load processed data and embeddings, preferring the memory-mapped binary store"""
+        prefix = store_prefix(processed_data_file)
+        if EmbeddingStore.exists(prefix):
+            store = EmbeddingStore.load(prefix)
+            self.processed_data = store.records
+            # Stores are normalised at write time, so the mmap can be used without a copy
+            self.embeddings = store.embeddings if store.normalized else normalize_rows(store.embeddings)
+            self.data_version = store.data_version
+        else:
+            self._load_legacy_json(processed_data_file)
+
+        self.index = self._load_index(prefix)
+        self.filters = self._load_filters(prefix)
+        self.lexical = self._load_lexical(prefix) if self.retrieval == 'hybrid' else None
+
+    def _load_legacy_json(self, processed_data_file: str):
+        # Legacy processed_data.json with embeddings as JSON float lists
         with open(processed_data_file, 'r', encoding='utf-8') as f:
+            stat = os.fstat(f.fileno())
             data = json.load(f)
-        
+
         self.processed_data = data['processed_data']
-        self.embeddings = np.array(data['embeddings'])
-    
-    def search(self, query: str, top_k: int = 10) -> List[Tuple[Dict, float]]:
+        embeddings = np.asarray(data['embeddings'], dtype=np.float32)
+        if embeddings.ndim != 2:
+            embeddings = embeddings.reshape(0, 0)
+        self.embeddings = normalize_rows(embeddings)
+        # No stored version: the file's size and mtime tell reloads and the watcher when it was rewritten
+        self.data_version = f"legacy-{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+    def _load_index(self, prefix: str):
+        """Pick the search backend; approximate mode falls back to exact if no fresh IVF index exists"""
+        if self.index_mode == 'approximate':
+            if not IVFIndex.exists(prefix):
+                print(f"No IVF index at {prefix}, falling back to exact search")
+            else:
+                index = IVFIndex.load(prefix, self.embeddings, self.nprobe)
+                if index.data_version == self.data_version:
+                    return index
+                print(f"IVF index at {prefix} is stale, falling back to exact search")
+        return ExactIndex(self.embeddings)
+
+    def _load_filters(self, prefix: str) -> Optional[MetadataIndex]:
+        """Use the metadata index built at ingestion if it matches this data; otherwise build on first use"""
+        if MetadataIndex.exists(prefix):
+            filters = MetadataIndex.load(prefix)
+            if filters.data_version == self.data_version and filters.n_rows == len(self.processed_data):
+                return filters
+            print(f"Metadata index at {prefix} is stale, rebuilding on first filtered search")
+        return None
+
+    def _load_lexical(self, prefix: str) -> LexicalIndex:
+        """Map the BM25 index built at ingestion, or build one in memory if it is missing or stale"""
+        if LexicalIndex.exists(prefix):
+            lexical = LexicalIndex.load(prefix)
+            if lexical.data_version == self.data_version and lexical.n_rows == len(self.processed_data):
+                return lexical
+            print(f"Lexical index at {prefix} is stale, rebuilding in memory")
+        else:
+            print(f"No lexical index at {prefix}, building in memory")
+        start = time.perf_counter()
+        lexical = LexicalIndex.build(self.processed_data, self.data_version)
+        self.timings['lexical_build'] = time.perf_counter() - start
+        return lexical
+
+    def filter_rows(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Row ids matching ``filters`` (see ``MetadataIndex.select``), or None for no filtering"""
+        if not filters:
+            return None
+        if self.filters is None:
+            self.filters = MetadataIndex.build(self.processed_data, self.data_version)
+        return self.filters.select(filters)
+
+    def encode(self, queries: List[str]) -> np.ndarray:
+        """Encode queries into L2-normalised vectors matching the index dtype"""
+        query_embeddings = self.model.encode(queries, convert_to_numpy=True, normalize_embeddings=True)
+        return np.asarray(query_embeddings, dtype=self.embeddings.dtype)
+
+    def search(self, query: str, top_k: int = 10,
+               filters: Optional[Dict[str, Any]] = None) -> List[Tuple[Dict, float]]:
         """Search for relevant content using vector similarity"""
-        query_embedding = self.model.encode([query])
-        similarities = cosine_similarity(query_embedding, self.embeddings)[0]
-        
-        # Get top-k most similar items
-        top_indices = np.argsort(similarities)[::-1][:top_k]
-        
+        return self.search_batch([query], top_k, filters)[0]
+
+    def search_batch(self, queries: List[str], top_k: int = 10,
+                     filters: Optional[Dict[str, Any]] = None) -> List[List[Tuple[Dict, float]]]:
+        """Search many queries at once with a single matrix multiply"""
+        if not queries:
+            return []
+        return self.search_embeddings(self.encode(queries), top_k, filters, queries=queries)
+
+    def search_embeddings(self, query_embeddings: np.ndarray, top_k: int = 10,
+                          filters: Optional[Dict[str, Any]] = None,
+                          queries: Optional[List[str]] = None) -> List[List[Tuple[Dict, float]]]:
+        """Score pre-encoded, normalised query vectors against the index.
+
+        With ``filters`` only the matching rows are scored, so top-k is taken
+        within the filtered subset rather than cut down after the fact. In
+        hybrid mode the ``queries`` texts also go through BM25 and the
+        two rankings are fused.
+        """
+        rows = self.filter_rows(filters)
+        if self.lexical is not None and queries is not None:
+            return self._search_hybrid(query_embeddings, queries, top_k, rows)
+        results = []
+        for ids, scores in self.index.search(query_embeddings, top_k, rows=rows):
+            keep = scores > MIN_SIMILARITY
+            results.append([(self.processed_data[idx], float(score))
+                            for idx, score in zip(ids[keep], scores[keep])])
+        return results
+
+    def _search_hybrid(self, query_embeddings: np.ndarray, queries: List[str], top_k: int,
+                       rows: Optional[np.ndarray]) -> List[List[Tuple[Dict, float]]]:
+        """Union dense and BM25 candidates and order them by reciprocal-rank fusion.
+
+        Results are ordered by descending ``rrf_score``, which each returned
+        record carries; the tuple's score is still the cosine similarity and
+        is not monotonic in that order. Lexical-only hits can have a
+        similarity below MIN_SIMILARITY, or even negative.
+        """
+        candidates = max(top_k, HYBRID_CANDIDATES)
+        dense = self.index.search(query_embeddings, candidates, rows=rows)
+        lexical = self.lexical.search(queries, candidates, rows=rows)
         results = []
-        for idx in top_indices:
-            if similarities[idx] > 0.1:  # Minimum similarity threshold
-                results.append((self.processed_data[idx], similarities[idx]))
-        
-        return results
\ No newline at end of file
+        for query, (dense_ids, dense_scores), (lexical_ids, _) in zip(query_embeddings, dense, lexical):
+            dense_ids = dense_ids[dense_scores > MIN_SIMILARITY]
+            ids, fused = reciprocal_rank_fusion([dense_ids, lexical_ids], top_k, RRF_K)
+            scores = self.embeddings[ids] @ query if len(ids) else np.empty(0, dtype=np.float32)
+            results.append([({**self.processed_data[idx], 'rrf_score': float(rrf)}, float(score))
+                            for idx, score, rrf in zip(ids, scores, fused)])
+        return results
@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+import pytest
+
+httpx = pytest.importorskip('httpx')
+
+from discourse_fetcher import DiscourseFetcher, FetchError, RateLimiter
+
+
+class StubDiscourse:
+    """Async MockTransport handler: per-URL scripted responses and an in-flight high-water mark"""
+
+    def __init__(self, delay: float = 0.0, script=None):
+        self.delay = delay
+        self.script = {url: list(responses) for url, responses in (script or {}).items()}
+        self.calls = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        self.calls[url] = self.calls.get(url, 0) + 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            responses = self.script.get(url)
+            step = responses.pop(0) if responses else None
+            if isinstance(step, Exception):
+                raise step
+            if isinstance(step, httpx.Response):
+                return step
+            return httpx.Response(200, json={'url': url})
+        finally:
+            self.in_flight -= 1
+
+
+def fetch_all(stub: StubDiscourse, urls, **options):
+    async def main():
+        options.setdefault('backoff_base', 0.01)
+        options.setdefault('requests_per_second', 1000)
+        async with DiscourseFetcher(transport=httpx.MockTransport(stub), **options) as fetcher:
+            return await asyncio.gather(*[fetcher.fetch_json(url) for url in urls])
+    return asyncio.run(main())
+
+
+def test_fetches_concurrently_up_to_the_limit():
+    stub = StubDiscourse(delay=0.05)
+    urls = [f"https://discourse.example/t/{i}.json" for i in range(12)]
+    start = time.perf_counter()
+    results = fetch_all(stub, urls, max_concurrency=4)
+    elapsed = time.perf_counter() - start
+
+    assert [result['url'] for result in results] == urls
+    assert stub.max_in_flight == 4
+    # Three waves of four, not twelve sequential requests
+    assert elapsed < 12 * 0.05
+
+
+def test_retries_server_errors_then_succeeds():
+    url = 'https://discourse.example/t/1.json'
+    stub = StubDiscourse(script={url: [httpx.Response(503), httpx.Response(502)]})
+    assert fetch_all(stub, [url])[0] == {'url': url}
+    assert stub.calls[url] == 3
+
+
+def test_retries_transport_errors():
+    url = 'https://discourse.example/t/1.json'
+    stub = StubDiscourse(script={url: [httpx.ConnectError('refused')]})
+    assert fetch_all(stub, [url])[0] == {'url': url}
+    assert stub.calls[url] == 2
+
+
+def test_honours_retry_after_on_429():
+    url = 'https://discourse.example/t/1.json'
+    stub = StubDiscourse(script={url: [httpx.Response(429, headers={'Retry-After': '0.3'})]})
+    start = time.perf_counter()
+    fetch_all(stub, [url])
+    assert time.perf_counter() - start >= 0.3
+    assert stub.calls[url] == 2
+
+
+def test_gives_up_after_max_retries():
+    url = 'https://discourse.example/t/1.json'
+    stub = StubDiscourse(script={url: [httpx.Response(503)] * 10})
+    with pytest.raises(FetchError) as error:
+        fetch_all(stub, [url], max_retries=2)
+    assert error.value.status_code == 503
+    assert stub.calls[url] == 3
+
+
+def test_client_errors_are_not_retried():
+    url = 'https://discourse.example/t/1.json'
+    stub = StubDiscourse(script={url: [httpx.Response(404)]})
+    with pytest.raises(FetchError) as error:
+        fetch_all(stub, [url])
+    assert error.value.status_code == 404
+    assert stub.calls[url] == 1
+
+
+def test_non_json_response_is_an_error():
+    url = 'https://discourse.example/t/1.json'
+    stub = StubDiscourse(script={url: [httpx.Response(200, text='<html>login</html>')]})
+    with pytest.raises(FetchError, match='not JSON'):
+        fetch_all(stub, [url])
+
+
+def test_rate_limit_applies_per_host():
+    stub = StubDiscourse()
+    one_host = [f"https://a.example/t/{i}.json" for i in range(8)]
+    two_hosts = one_host[:4] + [f"https://b.example/t/{i}.json" for i in range(4)]
+
+    # 4 requests/s with a burst of 4: the second four on one host wait about a second
+    start = time.perf_counter()
+    fetch_all(stub, one_host, requests_per_second=4, max_concurrency=8)
+    assert time.perf_counter() - start >= 0.9
+
+    # Split across two hosts, each bucket's burst covers its share
+    start = time.perf_counter()
+    fetch_all(stub, two_hosts, requests_per_second=4, max_concurrency=8)
+    assert time.perf_counter() - start < 0.5
+
+
+def test_token_bucket_spaces_requests_after_the_burst():
+    async def main():
+        limiter = RateLimiter(rate=20, burst=2)
+        start = time.perf_counter()
+        stamps = []
+        for _ in range(6):
+            await limiter.acquire()
+            stamps.append(time.perf_counter() - start)
+        return stamps
+
+    stamps = asyncio.run(main())
+    # Two immediately from the burst, then one every 1/20 s
+    assert stamps[1] < 0.02
+    assert stamps[-1] >= 4 / 20 * 0.9
+
+
+def test_slow_down_drains_the_bucket():
+    async def main():
+        limiter = RateLimiter(rate=10, burst=5)
+        limiter.slow_down(0.3)
+        start = time.perf_counter()
+        await limiter.acquire()
+        return time.perf_counter() - start
+
+    # 0.3 s of debt plus one token at 10/s
+    assert asyncio.run(main()) >= 0.35
@@ -0,0 +1,76 @@
+import numpy as np
+
+from lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+RECORDS = [
+    {'title': 'GA5 question 8', 'content': 'Use gpt-4o-mini for the GA5 vision question.'},
+    {'title': 'Docker setup', 'content': 'Install docker and run the container with podman as an alternative.'},
+    {'title': 'Pandas', 'content': 'Read the CSV with pandas and group by the date column.'},
+    {'title': 'Deployment', 'content': 'Deploy the FastAPI app with docker on a small server.'},
+    {'title': 'Models', 'content': 'Compare gpt-4o-mini with other models on cost.'},
+]
+
+
+def ranked_ids(index, query, rows=None):
+    ids, _ = index.search([query], 10, rows=rows)[0]
+    return ids.tolist()
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    tokens = tokenize('Is gpt-4o-mini in the GA5 notes?')
+    assert 'gpt-4o-mini' in tokens
+    assert {'gpt', '4o', 'mini', 'ga5'} <= set(tokens)
+    assert 'the' not in tokens
+
+
+def test_search_ranks_matching_rows_first():
+    index = LexicalIndex.build(RECORDS)
+    ids, scores = index.search(['gpt-4o-mini'], 3)[0]
+    assert set(ids.tolist()) == {0, 4}
+    assert np.all(np.diff(scores) <= 0)
+    # Terms in over a quarter of the rows are skipped when the query has rarer ones
+    assert ranked_ids(index, 'gpt-4o-mini ga5') == [0]
+    assert ranked_ids(index, 'kubernetes') == []
+
+
+def test_save_load_round_trip(tmp_path):
+    prefix = str(tmp_path / 'processed_data')
+    built = LexicalIndex.build(RECORDS, data_version='v1')
+    built.save(prefix)
+    assert LexicalIndex.exists(prefix)
+
+    loaded = LexicalIndex.load(prefix)
+    assert loaded.n_rows == len(RECORDS)
+    assert loaded.data_version == 'v1'
+    for name in ('term_hashes', 'offsets', 'doc_ids', 'weights'):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(built, name))
+    for query in ('docker', 'gpt-4o-mini', 'pandas csv date'):
+        expected_ids, expected_scores = built.search([query], 5)[0]
+        ids, scores = loaded.search([query], 5)[0]
+        np.testing.assert_array_equal(ids, expected_ids)
+        np.testing.assert_allclose(scores, expected_scores)
+
+
+def test_rows_restricts_search_to_subset():
+    index = LexicalIndex.build(RECORDS)
+    assert set(ranked_ids(index, 'docker')) == {1, 3}
+    assert ranked_ids(index, 'docker', rows=np.array([0, 3, 4])) == [3]
+    assert ranked_ids(index, 'docker', rows=np.array([0, 2])) == []
+    assert ranked_ids(index, 'docker', rows=np.array([], dtype=np.int64)) == []
+
+
+def test_reciprocal_rank_fusion_orders_by_summed_reciprocal_ranks():
+    dense = np.array([10, 20, 30])
+    lexical = np.array([30, 40])
+    ids, scores = reciprocal_rank_fusion([dense, lexical], top_k=3, k=60)
+    # 30 is third in one ranking and first in the other, so it beats 10; 20 and 40 tie and the lower row wins
+    assert ids.tolist() == [30, 10, 20]
+    np.testing.assert_allclose(scores, [1 / 63 + 1 / 61, 1 / 61, 1 / 62])
+
+
+def test_reciprocal_rank_fusion_breaks_ties_by_row_and_handles_empty_rankings():
+    ids, scores = reciprocal_rank_fusion([np.array([7]), np.array([3]), np.array([], dtype=np.int64)], top_k=5)
+    assert ids.tolist() == [3, 7]
+    assert scores[0] == scores[1]
+    ids, scores = reciprocal_rank_fusion([np.array([], dtype=np.int64)], top_k=5)
+    assert len(ids) == 0 and len(scores) == 0
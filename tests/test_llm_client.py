@@ -0,0 +1,141 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('openai')
+pytest.importorskip('httpx')
+
+from benchmarks.stub_llm import StubLLMServer
+from llm_client import AsyncLLMClient
+
+
+def run_with_client(server: StubLLMServer, coroutine_factory, **client_options):
+    """Run a coroutine against a fresh client pointed at the stub, closing the client afterwards"""
+    async def main():
+        client = AsyncLLMClient(api_key='stub', base_url=server.base_url, **client_options)
+        try:
+            return await coroutine_factory(client)
+        finally:
+            await client.aclose()
+    return asyncio.run(main())
+
+
+def test_generate_answer_returns_stub_answer():
+    with StubLLMServer() as server:
+        answer = run_with_client(server, lambda client: client.generate_answer('How do I merge?', []))
+    assert answer == server.answer
+    assert server.requests == 1
+
+
+def test_stream_answer_yields_full_answer():
+    async def collect(client):
+        return ''.join([delta async for delta in client.stream_answer('How do I merge?', [])])
+
+    with StubLLMServer() as server:
+        assert run_with_client(server, collect) == server.answer
+
+
+def test_retries_transient_failures():
+    with StubLLMServer(failures=2, failure_status=503) as server:
+        response = run_with_client(server, lambda client: client.complete(model='stub', messages=[]),
+                                   max_retries=3, backoff_base=0.01)
+    assert response.choices[0].message.content == server.answer
+    assert server.requests == 3
+
+
+def test_gives_up_after_max_retries():
+    import openai
+
+    with StubLLMServer(failures=5, failure_status=503) as server:
+        with pytest.raises(openai.APIStatusError):
+            run_with_client(server, lambda client: client.complete(model='stub', messages=[]),
+                            max_retries=2, backoff_base=0.01)
+    assert server.requests == 3
+
+
+def test_does_not_retry_client_errors():
+    import openai
+
+    with StubLLMServer(failures=1, failure_status=400) as server:
+        with pytest.raises(openai.BadRequestError):
+            run_with_client(server, lambda client: client.complete(model='stub', messages=[]),
+                            max_retries=3, backoff_base=0.01)
+    assert server.requests == 1
+
+
+def test_honours_retry_after():
+    with StubLLMServer(failures=1, failure_status=429, retry_after=0.3) as server:
+        start = time.perf_counter()
+        run_with_client(server, lambda client: client.complete(model='stub', messages=[]),
+                        max_retries=1, backoff_base=0.01)
+        elapsed = time.perf_counter() - start
+    assert server.requests == 2
+    assert elapsed >= 0.3
+
+
+def test_deadline_bounds_slow_responses():
+    with StubLLMServer(delay=1.0) as server:
+        start = time.perf_counter()
+        with pytest.raises(asyncio.TimeoutError):
+            run_with_client(server, lambda client: client.complete(model='stub', messages=[]), timeout=0.2)
+        elapsed = time.perf_counter() - start
+    assert elapsed < 0.8
+
+
+def test_no_retry_that_would_overrun_the_deadline():
+    import openai
+
+    with StubLLMServer(failures=1, failure_status=503, retry_after=5) as server:
+        start = time.perf_counter()
+        with pytest.raises(openai.APIStatusError):
+            run_with_client(server, lambda client: client.complete(model='stub', messages=[]),
+                            timeout=1.0, max_retries=3)
+        elapsed = time.perf_counter() - start
+    assert server.requests == 1
+    assert elapsed < 1.0
+
+
+def test_error_answer_instead_of_exception():
+    with StubLLMServer(delay=1.0) as server:
+        answer = run_with_client(server, lambda client: client.generate_answer('q', []), timeout=0.2)
+    assert answer.startswith("I apologize")
+
+
+def test_semaphore_caps_concurrent_requests():
+    async def fan_out(client):
+        return await asyncio.gather(*[client.complete(model='stub', messages=[]) for _ in range(8)])
+
+    with StubLLMServer(delay=0.1) as server:
+        start = time.perf_counter()
+        responses = run_with_client(server, fan_out, max_concurrency=2)
+        elapsed = time.perf_counter() - start
+    assert len(responses) == 8
+    assert server.max_in_flight == 2
+    # Four waves of two requests each
+    assert elapsed >= 0.4
+
+
+def test_stream_holds_its_slot_until_fully_read():
+    async def read(client):
+        return ''.join([delta async for delta in client.stream_answer('How do I merge?', [])])
+
+    async def fan_out(client):
+        return await asyncio.gather(*[read(client) for _ in range(3)])
+
+    with StubLLMServer(token_delay=0.01) as server:
+        answers = run_with_client(server, fan_out, max_concurrency=1)
+    assert answers == [server.answer] * 3
+    # Opening a stream is not enough to free the slot; the next one waits for the body to finish
+    assert server.max_in_flight == 1
+
+
+def test_closing_a_stream_early_releases_its_slot():
+    async def first_token_then_full(client):
+        stream = client.stream_answer('How do I merge?', [])
+        await stream.__anext__()
+        await stream.aclose()
+        return await asyncio.wait_for(client.generate_answer('Again?', []), 5)
+
+    with StubLLMServer(token_delay=0.01) as server:
+        assert run_with_client(server, first_token_then_full, max_concurrency=1) == server.answer
@@ -0,0 +1,27 @@
+from metadata_index import MetadataIndex, parse_timestamp
+
+RECORDS = [
+    {'source': 'discourse', 'created_at': '2025-04-14T23:59:00Z', 'like_count': 1},
+    {'source': 'discourse', 'created_at': '2025-04-15T00:00:00Z', 'like_count': 0},
+    {'source': 'discourse', 'created_at': '2025-04-15T18:30:00Z', 'like_count': 3},
+    {'source': 'discourse', 'created_at': '2025-04-16T00:00:00Z', 'like_count': 2},
+    {'source': 'course', 'file': 'intro.md'},
+]
+
+
+def selected(index, **filters):
+    return index.select(filters).tolist()
+
+
+def test_date_only_created_before_includes_the_whole_day():
+    index = MetadataIndex.build(RECORDS)
+    assert selected(index, created_before='2025-04-15') == [0, 1, 2]
+    assert selected(index, created_after='2025-04-15') == [1, 2, 3]
+    assert selected(index, created_after='2025-04-15', created_before='2025-04-15') == [1, 2]
+
+
+def test_created_before_with_a_time_is_exact():
+    index = MetadataIndex.build(RECORDS)
+    assert selected(index, created_before='2025-04-15T00:00:00Z') == [0, 1]
+    assert selected(index, created_before='2025-04-15T18:29:59') == [0, 1]
+    assert parse_timestamp('2025-04-15T12:00:00', end_of_day=True) == parse_timestamp('2025-04-15T12:00:00Z')